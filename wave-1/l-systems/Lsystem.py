@@ -1,9 +1,19 @@
 #!/usr/bin/env python3
 
+import os
 import turtle
 import random
 import time
-from typing import Dict
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from cache import axiom_key
+from growth import predict
+from opcodes import Program, compile_axiom, segments
+from rope import Rope, expand_rope
 """
 S - starting nonterminal
 f - forward terminal
@@ -48,42 +58,228 @@ class L_system:
 
 class L_builder:
     axiom = "S"
+    memory_budget = None  # characters, longer axioms are refused before building
+    cache = None  # cache.AxiomCache, deterministic axioms are looked up there before building
 
     def __init__(self, system):
         self.__system = system
 
+    def predict(self, iterations):
+        """
+        Length and command counts of the axiom after iterations,
+        expected values for stochastic rules, see growth.predict.
+        """
+        return predict(self.__system.expansion_rules,
+                       self.__system.terminal_rules, iterations, self.axiom)
+
+    def _check_budget(self, iterations):
+        if self.memory_budget is not None:
+            length = self.predict(iterations)["length"]
+            if length > self.memory_budget:
+                raise MemoryError(f"axiom would have {int(length)} characters, "
+                                  f"budget is {self.memory_budget}")
+
+    def _cache_key(self, iterations, seed=None):
+        system = self.__system
+        return axiom_key(system.expansion_rules, system.terminal_rules, system.angle, iterations, seed, self.axiom)
+
     # do not change the head of the function
     def build_system(self, iterations):
-        for i in range(iterations):
-            expanded_axiom = ""
-            for letter in self.axiom:
-                if letter in self.__system.expansion_rules.keys():
-                    if type(self.__system.expansion_rules[letter]) == str:
-                        expanded_axiom += self.__system.expansion_rules[letter]
-                    elif type(self.__system.expansion_rules[letter]) == list:
-                        expanded_axiom += random.choice(
-                            self.__system.expansion_rules[letter])
-                else:
-                    expanded_axiom += letter
-            self.axiom = expanded_axiom
-
-        final_axiom = ""
-        for letter in self.axiom:
-            if letter in self.__system.terminal_rules.keys():
-                final_axiom += self.__system.terminal_rules[letter]
-            else:
-                expanded_axiom += letter
-        self.axiom = final_axiom
+        self._check_budget(iterations)
+        if self.cache is None or stochastic_symbols(self.__system.expansion_rules):
+            self._expand(iterations)
+            return
+        key = self._cache_key(iterations)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.axiom = str(cached, "ascii")
+            return
+        self._expand(iterations)
+        self.cache.put(key, self.axiom)
+
+    def map_system(self, iterations):
+        """
+        The axiom of build_system(iterations) as read-only ASCII bytes from
+        self.cache, built and stored first if it is not there. A hit on a
+        plain entry is one mmap without copying, geometry.compile_string
+        reads it as it is.
+        """
+        if self.cache is None or stochastic_symbols(self.__system.expansion_rules):
+            raise ValueError("map_system needs a cache and deterministic rules")
+        key = self._cache_key(iterations)
+        cached = self.cache.get(key)
+        if cached is None:
+            self._expand(iterations)
+            self.cache.put(key, self.axiom)
+            cached = self.cache.get(key)
+        return cached if cached is not None else self.axiom.encode("ascii")
+
+    def _expand(self, iterations):
+        expansion_rules = self.__system.expansion_rules
+        if any(type(rule) == list for rule in expansion_rules.values()):
+            # one lookup per letter, random.choice only for list rules,
+            # drawn in the same order as letter by letter
+            lookup = expansion_rules.get
+            choice = random.choice
+            for i in range(iterations):
+                self.axiom = "".join([choice(rule) if type(rule) == list else rule
+                                      for rule in map(lookup, self.axiom, self.axiom)])
+        else:
+            # a generation is a substitution of every letter by its rule,
+            # the last one goes straight to the terminal strings
+            table = str.maketrans(expansion_rules)
+            for i in range(iterations - 1):
+                self.axiom = self.axiom.translate(table)
+            if iterations > 0:
+                self.axiom = self.axiom.translate({ord(letter): self._terminal(expansion_rules.get(letter, letter))
+                                                   for letter in set(self.axiom)})
+                return
+        self.axiom = self._terminal(self.axiom)
+
+    def _terminal(self, axiom):
+        # letters without terminal rule are left out
+        terminal_rules = self.__system.terminal_rules
+        return axiom.translate({ord(letter): terminal_rules.get(letter) for letter in set(axiom)})
 
     def get_axiom(self):
         # print(self.axiom)
         return self.axiom
 
+    def build_rope(self, iterations) -> Rope:
+        """
+        build_system with every (symbol, depth) subtree built once and shared,
+        only for deterministic rules. str() of the result is the axiom.
+        """
+        return expand_rope(self.axiom, self.__system.expansion_rules,
+                           self.__system.terminal_rules, iterations)
+
+    def compile_system(self, iterations) -> Program:
+        """
+        Expands straight into the opcode arrays of opcodes.compile_axiom,
+        sized by the predicted number of commands, without the axiom string.
+        """
+        counts = self.predict(iterations)
+        capacity = sum(counts[command] for command in ("f", "b", "turn", "[", "]"))
+        return compile_axiom(self.iter_system(iterations), int(capacity))
+
+    def iter_system(self, iterations, rng=random) -> Iterator[str]:
+        """
+        Lazy version of build_system, yields the terminal strings one by one
+        depth first, the axiom is never built. Memory grows with iterations,
+        not with the length of the output. Stochastic rules draw their random
+        choices in depth first order, so the result differs from build_system
+        for the same seed. rng is where they come from, a random.Random or
+        the random module.
+        """
+        expansion_rules = self.__system.expansion_rules
+        terminal_rules = self.__system.terminal_rules
+        # explicit stack of (rest of the expanded string, iterations left)
+        stack = [(iter(self.axiom), iterations)]
+        while stack:
+            letters, remaining = stack[-1]
+            for letter in letters:
+                if remaining > 0 and letter in expansion_rules:
+                    rule = expansion_rules[letter]
+                    if type(rule) == list:
+                        rule = rng.choice(rule)
+                    stack.append((iter(rule), remaining - 1))
+                    break
+                # letters without expansion rule stay the same until the
+                # terminal rules are applied
+                terminal = terminal_rules.get(letter)
+                if terminal:
+                    yield terminal
+            else:
+                stack.pop()
+
+    def iter_parallel(self, iterations, workers=None, chunks=64, seed=None) -> Iterator[str]:
+        """
+        Expands the axiom until it has at least chunks symbols, cuts it into
+        chunks pieces of about the same predicted output length and expands
+        every piece to the full depth in a process pool. Yields the expanded
+        pieces in order.
+        Stochastic rules draw from random.Random(seed) for the shallow part
+        and from a stream seeded by (seed, piece) in every piece, so the
+        result depends on seed and chunks, not on workers.
+        A seed of None is drawn from the random module. workers defaults to
+        the number of CPUs, with one the pieces are expanded in this process.
+        """
+        expansion_rules = self.__system.expansion_rules
+        if seed is None:
+            seed = random.getrandbits(64)
+        rng = random.Random(seed)
+
+        axiom = self.axiom
+        depth = 0
+        while depth < iterations and len(axiom) < chunks:
+            axiom = "".join(_expand_letter(letter, expansion_rules, rng) for letter in axiom)
+            depth += 1
+        remaining = iterations - depth
+
+        # expected output length of every symbol left at that depth
+        weights = {letter: float(predict(expansion_rules, self.__system.terminal_rules, remaining, letter)["length"])
+                   for letter in set(axiom)}
+        totals = list(accumulate(weights[letter] for letter in axiom))
+        cuts = [0] + [bisect_left(totals, totals[-1] * i / chunks) + 1 for i in range(1, chunks)] + [len(axiom)] \
+            if axiom else [0]
+        pieces = [axiom[start:end] for start, end in zip(cuts, cuts[1:]) if start < end]
+
+        # deterministic pieces need no seed and are expanded by str.translate
+        deterministic = not stochastic_symbols(expansion_rules)
+        arguments = ((self.__system, piece, remaining, None if deterministic else f"{seed}:{index}")
+                     for index, piece in enumerate(pieces))
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            yield from map(_expand_piece, arguments)
+            return
+        with ProcessPoolExecutor(workers) as pool:
+            yield from pool.map(_expand_piece, arguments)
+
+    def build_parallel(self, iterations, workers=None, chunks=64, seed=None):
+        """
+        build_system on a process pool, see iter_parallel. Deterministic
+        rules give the same axiom as build_system. Uses self.cache for
+        deterministic rules, and for stochastic ones when seed is given.
+        """
+        self._check_budget(iterations)
+        key = None
+        if self.cache is not None:
+            if not stochastic_symbols(self.__system.expansion_rules):
+                key = self._cache_key(iterations)
+            elif seed is not None:
+                key = self._cache_key(iterations, {"parallel": seed, "chunks": chunks})
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.axiom = str(cached, "ascii")
+                return
+        self.axiom = "".join(self.iter_parallel(iterations, workers, chunks, seed))
+        if key is not None:
+            self.cache.put(key, self.axiom)
+
+
+def _expand_letter(letter, expansion_rules, rng):
+    rule = expansion_rules.get(letter, letter)
+    return rng.choice(rule) if type(rule) == list else rule
+
+
+def _expand_piece(arguments):
+    # runs in the worker processes
+    system, piece, iterations, seed = arguments
+    builder = L_builder(system)
+    builder.axiom = piece
+    if seed is None:
+        builder._expand(iterations)
+        return builder.axiom
+    return "".join(builder.iter_system(iterations, random.Random(seed)))
+
 
 class L_drawer:
     # change speed for your animation but submit with speed 0
     speed = 0
 
+    # axiom can be a string, any iterable of strings like L_builder.iter_system
+    # or a Program compiled by opcodes.compile_axiom
     def __init__(self, axiom, distance, startPos, startAngle):
         self.__axiom = axiom
         self.__distance = distance  # distance for turtle forward / backward
@@ -103,34 +299,20 @@ class L_drawer:
 
         turtle.tracer(0, 0)  # stop the drawing animation
 
-        pos_stack = []
-
-        turn = ""
-        for letter in self.__axiom:
-            if len(turn) == 4:
-                if turn[0] == "r":
-                    pen.right(int(turn[1:]))
-                    # print("turning R")
-                elif turn[0] == "l":
-                    pen.left(int(turn[1:]))
-                    # print("turning L")
-                turn = ""
-            if letter == "f":
-                pen.forward(self.__distance)
-            elif letter == "b":
-                pen.backward(self.__distance)
-            elif letter == "r" or letter == "l":
-                turn = letter
-            elif letter in ("0", "1", "2", "3", "4", "5", "6", "7", "8", "9"):
-                turn += letter
-            elif letter == "[":
-                pos_stack.append((pen.pos(), pen.heading()))
-            elif letter == "]":
-                position, heading = pos_stack.pop()
+        program = self.__axiom
+        if not isinstance(program, Program):
+            program = compile_axiom(program)
+
+        # the turtle only draws the lines, the geometry comes from the program
+        position = self.startPos
+        for x0, y0, x1, y1 in segments(program, self.__distance,
+                                       self.startPos, self.startAngle):
+            if (x0, y0) != position:
                 pen.penup()
-                pen.goto(position)
-                pen.setheading(heading)
+                pen.goto(x0, y0)
                 pen.pendown()
+            pen.goto(x1, y1)
+            position = (x1, y1)
 
         turtle.update()  # show the drawing
         # uncomment if you want to see the drawing
@@ -140,6 +322,15 @@ class L_drawer:
         pen.clear()  # clear previous drawing from canvas [for automated tests]
 
 
+def write_axiom(axiom: Iterable[str], path):
+    """
+    Writes an axiom (string or iterable of strings like L_builder.iter_system)
+    into a file piece by piece, so it never has to be in memory at once.
+    """
+    with open(path, "w") as f:
+        f.writelines(axiom)
+
+
 def test_line(depth):
     expansion_rules = {
                     "S": "F",
@@ -544,8 +735,101 @@ def test_chaos(depth):
 
 
 # implementation of bonus function that builds recursive functions
-def Bonus(Lsystem):
-    pass
+def builder_name(symbol):
+    return "build_" + (symbol if symbol.isidentifier() else str(ord(symbol)))
+
+
+def stochastic_symbols(expansion_rules):
+    # symbols with list rules and all symbols that expand into them
+    stochastic = {symbol for symbol, rule in expansion_rules.items()
+                  if type(rule) == list}
+    changed = True
+    while changed:
+        changed = False
+        for symbol, rule in expansion_rules.items():
+            rules = rule if type(rule) == list else [rule]
+            if symbol not in stochastic and \
+                    any(letter in stochastic for r in rules for letter in r):
+                stochastic.add(symbol)
+                changed = True
+    return stochastic
+
+
+def compile_rule(rule, system):
+    # list of the pieces joined by the builder: constant terminal strings
+    # and calls of the builders of the nonterminals, one level deeper
+    pieces: List[str] = []
+    constant = ""
+    for letter in rule:
+        if letter in system.expansion_rules:
+            if constant:
+                pieces.append(repr(constant))
+                constant = ""
+            pieces.append(builder_name(letter) + "(depth - 1)")
+        else:
+            constant += system.terminal_rules.get(letter, "")
+    if constant:
+        pieces.append(repr(constant))
+    if not pieces:
+        return "''"
+    if len(pieces) == 1:
+        return pieces[0]
+    return "''.join([" + ", ".join(pieces) + "])"
+
+
+def compile_source(Lsystem):
+    """
+    Python source of recursive builders like hr_X / hr_H / hr_G, one per
+    nonterminal. Deterministic ones are cached on depth, so every
+    (symbol, depth) is built once.
+    """
+    stochastic = stochastic_symbols(Lsystem.expansion_rules)
+    lines = []
+    for symbol, rule in Lsystem.expansion_rules.items():
+        terminal = Lsystem.terminal_rules.get(symbol, "")
+        if symbol not in stochastic:
+            lines.append("@lru_cache(maxsize=None)")
+        lines.append(f"def {builder_name(symbol)}(depth):")
+        lines.append("    if depth <= 0:")
+        lines.append(f"        return {terminal!r}")
+        if type(rule) != list:
+            lines.append(f"    return {compile_rule(rule, Lsystem)}")
+        else:
+            # duplicates in the list are weights, like for random.choice
+            alternatives = list(dict.fromkeys(rule))
+            indices = tuple(alternatives.index(r) for r in rule)
+            lines.append(f"    alternative = {indices!r}[random.randrange({len(rule)})]")
+            for i, alternative in enumerate(alternatives[:-1]):
+                lines.append(f"    if alternative == {i}:")
+                lines.append(f"        return {compile_rule(alternative, Lsystem)}")
+            lines.append(f"    return {compile_rule(alternatives[-1], Lsystem)}")
+        lines.append("")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def Bonus(Lsystem) -> Dict[str, Callable[[int], str]]:
+    """
+    Compiles the L_system into recursive builder functions, returns them
+    by nonterminal. Bonus(system)["S"](depth) is the same as
+    L_builder(system).build_system(depth) for deterministic rules.
+    Stochastic rules draw in depth first order, so their output differs.
+    """
+    namespace = {"lru_cache": lru_cache, "random": random}
+    exec(compile(compile_source(Lsystem), "<L_system>", "exec"), namespace)
+    return {symbol: namespace[builder_name(symbol)]
+            for symbol in Lsystem.expansion_rules}
+
+
+def cached_bonus(Lsystem, cache) -> Dict[str, Callable[[int], str]]:
+    """
+    Bonus(Lsystem) with the deterministic builders answered from cache
+    (a cache.AxiomCache), keyed by the compiled source and the symbol.
+    """
+    source = compile_source(Lsystem)
+    stochastic = stochastic_symbols(Lsystem.expansion_rules)
+    return {symbol: builder if symbol in stochastic else cache.cached(builder, identity=[source, symbol])
+            for symbol, builder in Bonus(Lsystem).items()}
 
 
 # Basic tests
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+# compares L_builder.build_system with the builders compiled by Bonus on every test_* grammar
+# run from this directory: python3 bench_bonus.py --depths 10 11 12 13 14 15
+
+import argparse
+import random
+import time
+
+import Lsystem
+from grammars import grammars
+from growth import predict
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build_system against the Bonus builders")
+    parser.add_argument("--depths", type=int, nargs="+", default=list(range(10, 16)))
+    parser.add_argument("--max-length", type=float, default=5 * 10**7, help="skip axioms longer than this")
+    parser.add_argument("--budget", type=float, default=20, help="seconds, deeper runs of slower grammars are skipped")
+    args = parser.parse_args()
+
+    print(f"{'grammar':<32} {'depth':>5} {'length':>12} {'build_system':>13} {'Bonus':>10} {'speedup':>9} {'same':>5}")
+    for name, (system, _, _) in grammars().items():
+        deterministic = not Lsystem.stochastic_symbols(system.expansion_rules)
+        for depth in args.depths:
+            if predict(system.expansion_rules, system.terminal_rules, depth)["length"] > args.max_length:
+                print(f"{name:<32} {depth:>5} {'skipped, longer than --max-length':>50}")
+                break
+
+            random.seed(0)
+            builder = Lsystem.L_builder(system)
+            _, loop_time = timed(builder.build_system, depth)
+            # compiled fresh, so that the time includes filling the caches
+            random.seed(0)
+            compiled, compiled_time = timed(lambda: Lsystem.Bonus(system)["S"](depth))
+
+            same = str(compiled == builder.get_axiom()) if deterministic else "-"
+            print(f"{name:<32} {depth:>5} {len(compiled):>12} {loop_time:>12.3f}s {compiled_time:>9.3f}s "
+                  f"{loop_time / compiled_time:>8.1f}x {same:>5}", flush=True)
+            if loop_time > args.budget:
+                break
+
+
+if __name__ == '__main__':
+    main()
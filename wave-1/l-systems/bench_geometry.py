@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# throughput of the turtle geometry: the character loop of the original L_drawer.draw_L_system
+# (on turtle.TNavigator, the turtle without a window), the opcode interpreter and the numpy engine
+# run from this directory: python3 bench_geometry.py --depth 8
+
+import argparse
+import time
+import turtle
+
+import numpy as np
+
+import Lsystem
+from geometry import compile_string, segment_array
+from opcodes import compile_axiom, segments
+
+
+def character_loop(axiom: str, distance: float) -> int:
+    # the loop of L_drawer.draw_L_system before the opcodes, drawing replaced by counting lines
+    pen = turtle.TNavigator()
+    pos_stack = []
+    lines = 0
+    turn = ""
+    for letter in axiom:
+        if len(turn) == 4:
+            if turn[0] == "r":
+                pen.right(int(turn[1:]))
+            elif turn[0] == "l":
+                pen.left(int(turn[1:]))
+            turn = ""
+        if letter == "f":
+            pen.forward(distance)
+            lines += 1
+        elif letter == "b":
+            pen.backward(distance)
+            lines += 1
+        elif letter == "r" or letter == "l":
+            turn = letter
+        elif letter in ("0", "1", "2", "3", "4", "5", "6", "7", "8", "9"):
+            turn += letter
+        elif letter == "[":
+            pos_stack.append((pen.pos(), pen.heading()))
+        elif letter == "]":
+            position, heading = pos_stack.pop()
+            pen.goto(position)
+            pen.setheading(heading)
+    return lines
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="turtle geometry of test_barley_deterministic")
+    parser.add_argument("--depth", type=int, default=8)
+    args = parser.parse_args()
+
+    axiom = Lsystem.test_barley_deterministic(args.depth)
+    distance = 8
+    _, loop_time = timed(character_loop, axiom, distance)
+    program, compile_time = timed(compile_axiom, axiom)
+    lines, interpret_time = timed(lambda: np.array(list(segments(program, distance))))
+    array, numpy_time = timed(segment_array, program, distance)
+    _, numpy_compile_time = timed(compile_string, axiom)
+    if not np.allclose(lines.reshape(-1, 4), array, atol=1e-6):
+        raise AssertionError("numpy geometry differs from the interpreter")
+
+    print(f"{len(axiom)} characters, {program.commands} commands, {len(array)} lines")
+    print(f"{'engine':<32} {'seconds':>9} {'commands/s':>12} {'speedup':>8}")
+    for name, seconds in (("L_drawer character loop", loop_time),
+                          ("opcodes.segments", interpret_time),
+                          ("geometry.segment_array", numpy_time),
+                          ("compile_axiom + segment_array", compile_time + numpy_time),
+                          ("compile_string + segment_array", numpy_compile_time + numpy_time)):
+        print(f"{name:<32} {seconds:>9.3f} {program.commands / seconds:>12.0f} {loop_time / seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+# commands per second of opcodes.compile_axiom and of the segments interpreter on every test_* grammar
+# run from this directory: python3 bench_opcodes.py --depth 8
+
+import argparse
+import random
+import time
+
+import Lsystem
+from grammars import grammars
+from opcodes import compile_axiom, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="speed of the opcode compiler and interpreter")
+    parser.add_argument("--depth", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'grammar':<32} {'commands':>10} {'opcodes':>10} {'compile':>14} {'interpret':>14}")
+    for name, (system, _, _) in grammars().items():
+        random.seed(0)
+        builder = Lsystem.L_builder(system)
+        builder.build_system(args.depth)
+        axiom = builder.get_axiom()
+
+        start = time.perf_counter()
+        program = compile_axiom(axiom)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in segments(program, system.distance):
+            pass
+        interpret_time = time.perf_counter() - start
+
+        print(f"{name:<32} {program.commands:>10} {len(program):>10} "
+              f"{program.commands / compile_time / 10**6:>8.2f} M/s {program.commands / interpret_time / 10**6:>8.2f} M/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+# compares L_builder.build_system with build_parallel on a process pool
+# run from this directory: python3 bench_parallel.py --depth 12 --workers 1 2 4
+
+import argparse
+import os
+import time
+
+import Lsystem
+from grammars import grammars
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build_system against build_parallel")
+    parser.add_argument("--grammars", nargs="+", default=["test_barley_deterministic", "test_harder_recursive",
+                                                          "test_barley_non_deterministic"])
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--chunks", type=int, default=64)
+    args = parser.parse_args()
+
+    found = grammars()
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'grammar':<32} {'engine':<24} {'length':>10} {'seconds':>9} {'speedup':>8}")
+    for name in args.grammars:
+        system = found[name].system
+        builder = Lsystem.L_builder(system)
+        _, serial_time = timed(builder.build_system, args.depth)
+        print(f"{name:<32} {'build_system':<24} {len(builder.get_axiom()):>10} {serial_time:>9.3f} {1:>7.1f}x",
+              flush=True)
+        for workers in args.workers:
+            builder = Lsystem.L_builder(system)
+            _, parallel_time = timed(builder.build_parallel, args.depth, workers, args.chunks, seed=0)
+            print(f"{name:<32} {f'build_parallel({workers})':<24} {len(builder.get_axiom()):>10} "
+                  f"{parallel_time:>9.3f} {serial_time / parallel_time:>7.1f}x", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# compares L_builder.build_system with the letter by letter loop it used before
+# run from this directory: python3 bench_translate.py --depths 6 8 10 12
+
+import argparse
+import random
+import time
+
+import Lsystem
+from grammars import grammars
+from growth import predict
+
+
+def loop_system(system, iterations, axiom="S"):
+    # the previous body of build_system
+    for i in range(iterations):
+        expanded_axiom = ""
+        for letter in axiom:
+            if letter in system.expansion_rules.keys():
+                if type(system.expansion_rules[letter]) == str:
+                    expanded_axiom += system.expansion_rules[letter]
+                elif type(system.expansion_rules[letter]) == list:
+                    expanded_axiom += random.choice(system.expansion_rules[letter])
+            else:
+                expanded_axiom += letter
+        axiom = expanded_axiom
+
+    final_axiom = ""
+    for letter in axiom:
+        if letter in system.terminal_rules.keys():
+            final_axiom += system.terminal_rules[letter]
+    return final_axiom
+
+
+def translated_system(system, iterations):
+    builder = Lsystem.L_builder(system)
+    builder.build_system(iterations)
+    return builder.get_axiom()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build_system against the previous letter by letter loop")
+    parser.add_argument("--depths", type=int, nargs="+", default=list(range(6, 13)))
+    parser.add_argument("--max-length", type=float, default=5 * 10**7, help="skip axioms longer than this")
+    args = parser.parse_args()
+
+    print(f"{'grammar':<32} {'depth':>5} {'length':>10} {'loop gen/s':>11} {'translate gen/s':>16} {'speedup':>8} {'same':>5}")
+    for name, (system, _, _) in grammars().items():
+        for depth in args.depths:
+            if predict(system.expansion_rules, system.terminal_rules, depth)["length"] > args.max_length:
+                print(f"{name:<32} {depth:>5} {'skipped, longer than --max-length':>45}")
+                break
+            random.seed(0)
+            expected, loop_time = timed(loop_system, system, depth)
+            random.seed(0)
+            result, translate_time = timed(translated_system, system, depth)
+            print(f"{name:<32} {depth:>5} {len(result):>10} {depth / loop_time:>11.1f} "
+                  f"{depth / translate_time:>16.1f} {loop_time / translate_time:>7.1f}x "
+                  f"{str(result == expected):>5}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
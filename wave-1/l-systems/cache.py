@@ -0,0 +1,125 @@
+import hashlib
+import inspect
+import json
+import lzma
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+"""
+Expanded axioms kept on disk between runs, under the hash of everything the
+axiom depends on. Plain entries are mapped into memory on a hit, compressed
+ones (lzma) take less space but are decompressed. The least recently used
+entries are removed when the cache grows over its size.
+"""
+
+DEFAULT_DIRECTORY = Path(os.environ.get("LSYSTEM_CACHE", Path.home() / ".cache" / "lsystem"))
+DEFAULT_SIZE = 2**32  # bytes
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def axiom_key(expansion_rules: Dict, terminal_rules: Dict, angle, depth: int, seed=None, axiom: str = "S") -> str:
+    """
+    Hash of the rules, angle, depth, seed and starting axiom.
+    seed is anything json can write, None for deterministic rules.
+    """
+    content = json.dumps({"expansion_rules": expansion_rules, "terminal_rules": terminal_rules, "angle": angle,
+                          "depth": depth, "seed": seed, "axiom": axiom}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class AxiomCache:
+    def __init__(self, directory: Union[str, Path] = DEFAULT_DIRECTORY, max_bytes: int = DEFAULT_SIZE,
+                 compress: bool = False):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, key: str):
+        return self.directory / f"{key}.txt", self.directory / f"{key}.txt.xz"
+
+    def get(self, key: str) -> Optional[Buffer]:
+        """
+        The stored axiom as ASCII bytes, a read-only mmap of the file for
+        plain entries. None when it is not cached.
+        """
+        plain, compressed = self._paths(key)
+        for path in (plain, compressed):
+            try:
+                with open(path, "rb") as f:
+                    # last use is the modification time, for the eviction
+                    os.utime(f.fileno())
+                    if path == compressed:
+                        return lzma.decompress(f.read())
+                    if os.fstat(f.fileno()).st_size == 0:
+                        return b""
+                    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def put(self, key: str, axiom: Union[str, Buffer]) -> None:
+        data = axiom.encode("ascii") if isinstance(axiom, str) else axiom
+        path = self._paths(key)[1 if self.compress else 0]
+        if self.compress:
+            data = lzma.compress(data, preset=1)
+        if len(data) > self.max_bytes:
+            return
+        # written next to the entries and renamed, so a reader never sees half a file
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+            f.write(data)
+        os.replace(f.name, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the rest fits into max_bytes.
+        """
+        entries = []
+        for path in self.directory.glob("*.txt*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.txt*"):
+            path.unlink(missing_ok=True)
+
+    def cached(self, builder: Callable[[int], str], *callees: Callable, identity=None) -> Callable[[int], str]:
+        """
+        builder(depth) answered from the cache, for the recursive builders.
+        identity is what the result depends on. When it is None, that is the
+        source code of builder and of every function in callees, which has
+        to list all functions builder calls, like
+        cache.cached(harder_recursive, hr_X, hr_H, hr_G).
+        Compiled builders have no source, see Lsystem.cached_bonus.
+        """
+        if identity is None:
+            try:
+                identity = [inspect.getsource(function) for function in (builder,) + callees]
+            except OSError as e:
+                raise ValueError(f"no source code of {builder.__name__}, pass identity") from e
+
+        def cached_builder(depth: int) -> str:
+            key = hashlib.sha256(json.dumps([identity, depth]).encode()).hexdigest()
+            hit = self.get(key)
+            if hit is not None:
+                return str(hit, "ascii")
+            axiom = builder(depth)
+            self.put(key, axiom)
+            return axiom
+
+        cached_builder.__name__ = builder.__name__
+        return cached_builder
@@ -0,0 +1,150 @@
+import mmap
+from array import array
+from typing import Tuple, Union
+
+import numpy as np
+
+from opcodes import BACKWARD, FORWARD, POP, PUSH, TURN, Program
+
+"""
+Turtle geometry of a whole program at once. Headings are a cumulative sum of
+the turns and positions a cumulative sum of the steps, [ and ] are turned into
+corrections at every ] that undo what happened since the matching [.
+"""
+
+
+def compile_string(axiom: Union[str, bytes, mmap.mmap]) -> Program:
+    """
+    Same Program as opcodes.compile_axiom(axiom), with the characters
+    classified by numpy. Only the numbers of turns are parsed one by one.
+    ASCII bytes or an mmap (see L_builder.map_system) are read without a copy.
+    """
+    data = axiom.encode() if isinstance(axiom, str) else axiom
+    chars = np.frombuffer(data, dtype=np.uint8)
+    numeric = ((chars >= ord("0")) & (chars <= ord("9"))) | (chars == ord("."))
+    digit_follows = np.zeros(len(chars), dtype=bool)
+    digit_follows[:-1] = (chars[1:] >= ord("0")) & (chars[1:] <= ord("9"))
+    turn = ((chars == ord("r")) | (chars == ord("l"))) & digit_follows
+
+    tokens = np.flatnonzero(turn | (chars == ord("f")) | (chars == ord("b")) | (chars == ord("[")) | (chars == ord("]")))
+    token_chars = chars[tokens]
+    ops = np.full(len(tokens), POP, dtype=np.uint8)
+    ops[token_chars == ord("f")] = FORWARD
+    ops[token_chars == ord("b")] = BACKWARD
+    ops[token_chars == ord("[")] = PUSH
+    is_turn = turn[tokens]
+    ops[is_turn] = TURN
+    operands = ((token_chars == ord("f")) | (token_chars == ord("b"))).astype(np.float64)
+
+    # a number runs until the first character that is not a digit or a dot
+    run_ends = np.flatnonzero(numeric & ~np.append(numeric[1:], False)) + 1
+    turn_starts = tokens[is_turn] + 1
+    turn_ends = run_ends[np.searchsorted(run_ends, turn_starts, side="right")]
+    decoded = {}
+    angles = []
+    for start, end in zip(turn_starts.tolist(), turn_ends.tolist()):
+        number = data[start:end]
+        angle = decoded.get(number)
+        if angle is None:
+            # like the tokenizer, the number ends at a second dot
+            parts = number.split(b".", 2)
+            angle = decoded[number] = float(b".".join(parts[:2]))
+        angles.append(angle)
+    operands[is_turn] = np.array(angles, dtype=np.float64) * np.where(token_chars[is_turn] == ord("l"), 1, -1)
+
+    # runs of the same forward, backward or turn opcode become one
+    merged = np.zeros(len(ops), dtype=bool)
+    merged[1:] = (ops[1:] == ops[:-1]) & (ops[1:] <= TURN)
+    starts = np.flatnonzero(~merged)
+    return Program(array("B", ops[starts].tobytes()),
+                   array("d", np.add.reduceat(operands, starts).tobytes() if len(starts) else b""),
+                   len(tokens))
+
+
+def bracket_pairs(ops: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Indices of matching [ and ] and of the enclosing pair of every pair
+    (-1 on the outermost level). A [ that is never closed is left out.
+    """
+    push = ops == PUSH
+    pop = ops == POP
+    depth = np.cumsum(push.astype(np.int64) - pop)
+    if len(depth) and (depth.min() < 0):
+        raise ValueError("] without matching [")
+    # level of a bracket: depth after [ and depth before ]
+    level = np.where(push, depth, depth + 1)
+
+    opens, closes, parents = [], [], []
+    previous_opens = np.zeros(0, dtype=np.int64)
+    previous_closed = 0
+    offset = 0
+    brackets = np.flatnonzero(push | pop)
+    levels = level[brackets]
+    order = np.argsort(levels, kind="stable")
+    boundaries = np.searchsorted(levels[order], np.arange(1, levels.max() + 2)) if len(levels) else [0]
+    # on one level [ and ] alternate, so they pair up in order
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        indices = brackets[order[first:last]]
+        # the last [ of a level may stay open, it is kept only to find parents
+        all_opens = indices[0::2]
+        level_opens, level_closes = all_opens[:len(indices) // 2], indices[1::2]
+        parent = np.searchsorted(previous_opens, level_opens) - 1
+        # inside an open [ or on the outermost level there is nothing to undo
+        closed_parent = (parent >= 0) & (parent < previous_closed)
+        parents.append(np.where(closed_parent, parent + offset - previous_closed, -1))
+        opens.append(level_opens)
+        closes.append(level_closes)
+        previous_opens = all_opens
+        previous_closed = len(level_opens)
+        offset += len(level_opens)
+
+    if not opens:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(opens), np.concatenate(closes), np.concatenate(parents)
+
+
+def _restore_at_pops(deltas: np.ndarray, opens: np.ndarray, closes: np.ndarray, parents: np.ndarray) -> np.ndarray:
+    """
+    Adds to every ] (in place) what brings the cumulative sum of deltas back to its value at the matching [.
+    Nested pairs already undo themselves, so a pair has to undo only the rest.
+    """
+    if len(opens) == 0:
+        return deltas
+    cumulative = np.cumsum(deltas)
+    inside = cumulative[closes] - cumulative[opens]
+    has_parent = parents >= 0
+    nested = np.bincount(parents[has_parent], inside[has_parent].real, len(opens)).astype(deltas.dtype)
+    if np.iscomplexobj(deltas):
+        nested += 1j * np.bincount(parents[has_parent], inside[has_parent].imag, len(opens))
+    deltas[closes] += nested - inside
+    return deltas
+
+
+def segment_array(program: Program,
+                  distance: float,
+                  start_pos: Tuple[float, float] = (0, 0),
+                  start_angle: float = 0) -> np.ndarray:
+    """
+    All lines drawn by the program as an (n, 4) array of x0, y0, x1, y1,
+    same as opcodes.segments, computed with numpy.
+    """
+    ops = np.frombuffer(program.ops, dtype=np.uint8)
+    operands = np.frombuffer(program.operands, dtype=np.float64)
+    opens, closes, parents = bracket_pairs(ops)
+
+    turns = np.where(ops == TURN, operands, 0.0)
+    headings = start_angle + np.cumsum(_restore_at_pops(turns, opens, closes, parents))
+
+    # positions as complex numbers x + yj, a step is length * e**(i * heading)
+    moves = np.flatnonzero((ops == FORWARD) | (ops == BACKWARD))
+    lengths = np.where(ops[moves] == FORWARD, operands[moves], -operands[moves]) * distance
+    move_steps = lengths * np.exp(1j * np.radians(headings[moves] % 360))
+    steps = np.zeros(len(ops), dtype=np.complex128)
+    steps[moves] = move_steps
+    positions = complex(*start_pos) + np.cumsum(_restore_at_pops(steps, opens, closes, parents))
+
+    # a line starts where the turtle was before its opcode, so joined lines share the exact point
+    starts = np.concatenate(([complex(*start_pos)], positions[:-1]))[moves]
+    ends = positions[moves]
+    return np.column_stack((starts.real, starts.imag, ends.real, ends.imag))
@@ -0,0 +1,43 @@
+import inspect
+from typing import Dict, NamedTuple, Tuple
+
+import Lsystem
+
+
+class Grammar(NamedTuple):
+    system: Lsystem.L_system
+    start_pos: Tuple[float, float]
+    start_angle: float
+
+
+def grammars() -> Dict[str, Grammar]:
+    """
+    The L_system and drawer start of every test_* function, caught by
+    running it at depth 1.
+    """
+    found = {}
+    original_builder, original_drawer = Lsystem.L_builder, Lsystem.L_drawer
+    for name, test in inspect.getmembers(Lsystem, inspect.isfunction):
+        if not name.startswith("test_"):
+            continue
+        systems = []
+        drawers = []
+
+        class RecordingBuilder(original_builder):
+            def __init__(self, system):
+                systems.append(system)
+                super().__init__(system)
+
+        class RecordingDrawer(original_drawer):
+            def __init__(self, axiom, distance, startPos, startAngle):
+                drawers.append((startPos, startAngle))
+                super().__init__(axiom, distance, startPos, startAngle)
+
+        Lsystem.L_builder, Lsystem.L_drawer = RecordingBuilder, RecordingDrawer
+        try:
+            # stochastic tests take a seed
+            test(*[1] * len(inspect.signature(test).parameters))
+        finally:
+            Lsystem.L_builder, Lsystem.L_drawer = original_builder, original_drawer
+        found[name] = Grammar(systems[0], *drawers[0])
+    return found
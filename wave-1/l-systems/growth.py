@@ -0,0 +1,100 @@
+import re
+from fractions import Fraction
+from typing import Dict, List, Union
+
+"""
+Sizes of L-system axioms without building them. One generation maps the
+counts of symbols by a growth matrix (row = symbol, column = how many of each
+symbol its rule produces), so depth generations are a matrix power, computed
+by repeated squaring in O(k**3 log depth) for k symbols.
+"""
+
+Number = Union[int, Fraction]
+Matrix = List[List[Number]]
+
+# kinds of terminal commands, counted separately
+COMMANDS = ("length", "f", "b", "turn", "[", "]", "other")
+_COMMAND = re.compile(r"[rl]\d+(?:\.\d+)?|.")
+
+
+def _symbols(expansion_rules: Dict, terminal_rules: Dict, axiom: str) -> List[str]:
+    symbols = dict.fromkeys(axiom)
+    for symbol, rule in expansion_rules.items():
+        symbols[symbol] = None
+        for alternative in (rule if type(rule) == list else [rule]):
+            symbols.update(dict.fromkeys(alternative))
+    symbols.update(dict.fromkeys(terminal_rules))
+    return list(symbols)
+
+
+def growth_matrix(expansion_rules: Dict, symbols: List[str]) -> Matrix:
+    """
+    Symbol counts produced by one generation. List (stochastic) rules give
+    the expected counts, every alternative equally likely like random.choice.
+    """
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    matrix: Matrix = [[0] * len(symbols) for _ in symbols]
+    for i, symbol in enumerate(symbols):
+        rule = expansion_rules.get(symbol)
+        if rule is None:
+            matrix[i][i] = 1  # letters without rule stay the same
+            continue
+        alternatives = rule if type(rule) == list else [rule]
+        weight = Fraction(1, len(alternatives)) if len(alternatives) > 1 else 1
+        for alternative in alternatives:
+            for letter in alternative:
+                matrix[i][index[letter]] += weight
+    return matrix
+
+
+def command_counts(terminal: str) -> Dict[str, int]:
+    counts = dict.fromkeys(COMMANDS, 0)
+    counts["length"] = len(terminal)
+    for command in _COMMAND.findall(terminal):
+        if command in ("f", "b", "[", "]"):
+            counts[command] += 1
+        elif len(command) > 1:
+            counts["turn"] += 1
+        else:
+            counts["other"] += 1
+    return counts
+
+
+def _multiply(a: Matrix, b: Matrix) -> Matrix:
+    columns = list(zip(*b))
+    return [[sum(x * y for x, y in zip(row, column) if x and y) for column in columns] for row in a]
+
+
+def matrix_power(matrix: Matrix, exponent: int) -> Matrix:
+    result: Matrix = [[int(i == j) for j in range(len(matrix))] for i in range(len(matrix))]
+    while exponent > 0:
+        if exponent & 1:
+            result = _multiply(result, matrix)
+        matrix = _multiply(matrix, matrix)
+        exponent >>= 1
+    return result
+
+
+def symbol_counts(expansion_rules: Dict, terminal_rules: Dict, depth: int, axiom: str = "S") -> Dict[str, Number]:
+    """
+    How many of every symbol the axiom has after depth generations,
+    before the terminal rules are applied. Exact, or expected for list rules.
+    """
+    symbols = _symbols(expansion_rules, terminal_rules, axiom)
+    start = [axiom.count(symbol) for symbol in symbols]
+    power = matrix_power(growth_matrix(expansion_rules, symbols), depth)
+    return {symbol: sum(start[i] * power[i][j] for i in range(len(symbols)))
+            for j, symbol in enumerate(symbols)}
+
+
+def predict(expansion_rules: Dict, terminal_rules: Dict, depth: int, axiom: str = "S") -> Dict[str, Number]:
+    """
+    Length and number of f / b / turn / [ / ] commands of the final axiom of
+    L_builder.build_system(depth), symbols without terminal rule vanish.
+    """
+    totals: Dict[str, Number] = dict.fromkeys(COMMANDS, 0)
+    for symbol, count in symbol_counts(expansion_rules, terminal_rules, depth, axiom).items():
+        if count:
+            for command, n in command_counts(terminal_rules.get(symbol, "")).items():
+                totals[command] += count * n
+    return totals
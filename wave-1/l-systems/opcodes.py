@@ -0,0 +1,144 @@
+import math
+import re
+from array import array
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+"""
+Axioms compiled into two flat arrays, an opcode per command and its float
+operand, parsed once and then interpreted by any backend.
+Runs of f, of b and of turns are merged into one opcode each.
+"""
+
+FORWARD = 0  # operand: number of steps
+BACKWARD = 1  # operand: number of steps
+TURN = 2  # operand: degrees, left positive like turtle.left
+PUSH = 3
+POP = 4
+
+_TOKEN = re.compile(r"f+|b+|[rl]\d+(?:\.\d*)?|\[|\]")
+_BLOCK_SIZE = 2**20  # characters tokenized at once when the axiom comes in pieces
+_UNFINISHED = re.compile(r"[rl][\d.]*$")  # end of a block that may be a turn cut in two
+
+Segment = Tuple[float, float, float, float]
+
+
+class Program:
+    """
+    Compiled axiom. ops and operands are arrays of the same length,
+    commands is how many commands of the axiom they stand for.
+    """
+
+    __slots__ = ("ops", "operands", "commands")
+
+    def __init__(self, ops: array, operands: array, commands: int):
+        self.ops = ops
+        self.operands = operands
+        self.commands = commands
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+
+def _blocks(axiom: Union[str, Iterable[str]]) -> Iterator[str]:
+    # pieces are joined into blocks, a turn that may continue in the next
+    # piece is held back and put in front of the next block
+    if isinstance(axiom, str):
+        yield axiom
+        return
+    pieces = []
+    size = 0
+    for piece in axiom:
+        pieces.append(piece)
+        size += len(piece)
+        if size >= _BLOCK_SIZE:
+            block = "".join(pieces)
+            rest = _UNFINISHED.search(block)
+            if rest is None:
+                yield block
+                pieces, size = [], 0
+            elif rest.start() > 0:
+                yield block[:rest.start()]
+                pieces, size = [rest.group()], len(rest.group())
+    if pieces:
+        yield "".join(pieces)
+
+
+def _decode(token: str) -> Tuple[int, float, int]:
+    # (opcode, operand, number of commands)
+    if token[0] == "f":
+        return FORWARD, len(token), len(token)
+    if token[0] == "b":
+        return BACKWARD, len(token), len(token)
+    if token[0] == "l":
+        return TURN, float(token[1:]), 1
+    if token[0] == "r":
+        return TURN, -float(token[1:]), 1
+    return (PUSH if token == "[" else POP), 0.0, 1
+
+
+def compile_axiom(axiom: Union[str, Iterable[str]], capacity: Optional[int] = None) -> Program:
+    """
+    Compiles an axiom string, or an iterable of whole command strings like
+    L_builder.iter_system. capacity is the expected number of commands
+    (see L_builder.predict), the arrays are allocated once for it.
+    Characters that are not commands are skipped.
+    """
+    size = max(16, capacity or 0)
+    ops = array("B", bytes(size))
+    operands = array("d", bytes(8 * size))
+    n = 0
+    last = -1
+    commands = 0
+    decoded = {}  # axioms repeat the same few tokens, each is parsed once
+
+    for block in _blocks(axiom):
+        for token in _TOKEN.findall(block):
+            code = decoded.get(token)
+            if code is None:
+                code = decoded[token] = _decode(token)
+            op, operand, count = code
+            commands += count
+
+            if op == last and op <= TURN:
+                operands[n - 1] += operand
+                continue
+            if n == size:
+                ops.extend(bytes(size))
+                operands.extend(array("d", bytes(8 * size)))
+                size *= 2
+            ops[n] = op
+            operands[n] = operand
+            n += 1
+            last = op
+
+    del ops[n:]
+    del operands[n:]
+    return Program(ops, operands, commands)
+
+
+def segments(program: Program,
+             distance: float,
+             start_pos: Tuple[float, float] = (0, 0),
+             start_angle: float = 0) -> Iterator[Segment]:
+    """
+    Runs the program like the turtle of L_drawer and yields every drawn line
+    as (x0, y0, x1, y1). Angles in degrees, 0 is east, counterclockwise.
+    """
+    x, y = start_pos
+    heading = start_angle
+    dx, dy = math.cos(math.radians(heading)), math.sin(math.radians(heading))
+    stack = []
+    for op, operand in zip(program.ops, program.operands):
+        if op == FORWARD or op == BACKWARD:
+            length = operand * distance if op == FORWARD else -operand * distance
+            end_x, end_y = x + dx * length, y + dy * length
+            yield x, y, end_x, end_y
+            x, y = end_x, end_y
+        elif op == TURN:
+            heading = (heading + operand) % 360
+            dx, dy = math.cos(math.radians(heading)), math.sin(math.radians(heading))
+        elif op == PUSH:
+            stack.append((x, y, heading))
+        else:
+            x, y, heading = stack.pop()
+            dx, dy = math.cos(math.radians(heading)), math.sin(math.radians(heading))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# draws L-systems into SVG or PNG files without any display
+# python3 render.py test_barley_deterministic 12 -o barley.png --size 2000
+
+import argparse
+import math
+import random
+import struct
+import zlib
+from array import array
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from cache import AxiomCache
+from geometry import compile_string, segment_array
+from opcodes import Program
+
+BoundingBox = Tuple[float, float, float, float]  # min x, min y, max x, max y
+
+
+def trace(program: Program,
+          distance: float,
+          start_pos: Tuple[float, float] = (0, 0),
+          start_angle: float = 0) -> Tuple[List[array], BoundingBox]:
+    """
+    Joins the lines drawn by the program into polylines, flat arrays
+    x0, y0, x1, y1, ... Lines continuing in the same direction are merged
+    into one. Also returns the bounding box.
+    """
+    lines = segment_array(program, distance, start_pos, start_angle)
+    if not len(lines):
+        return [], (0.0, 0.0, 0.0, 0.0)
+    starts, ends = lines[:, :2], lines[:, 2:]
+    directions = ends - starts
+
+    # a line continues the polyline when it starts exactly where the previous one ended
+    joined = np.zeros(len(lines), dtype=bool)
+    joined[1:] = (starts[1:] == ends[:-1]).all(axis=1)
+    # collinear and same way, the last point just moves further
+    cross = directions[1:, 0] * directions[:-1, 1] - directions[1:, 1] * directions[:-1, 0]
+    dot = (directions[1:] * directions[:-1]).sum(axis=1)
+    extends = np.zeros(len(lines), dtype=bool)
+    extends[1:] = joined[1:] & (np.abs(cross) <= 1e-9 * np.abs(directions[1:]).sum(axis=1)) & (dot > 0)
+
+    # every polyline is its first start and the ends not moved further by the next line
+    keep_end = np.ones(len(lines), dtype=bool)
+    keep_end[:-1] = ~extends[1:]
+    points = np.concatenate((starts[~joined], ends[keep_end]))
+    # order: the start of a polyline comes before the ends of its lines
+    order = np.concatenate((np.flatnonzero(~joined) * 2, np.flatnonzero(keep_end) * 2 + 1))
+    points = points[np.argsort(order, kind="stable")]
+    polyline_starts = np.searchsorted(np.sort(order), np.flatnonzero(~joined) * 2)
+    polylines = [array("d", part.tobytes()) for part in np.split(points, polyline_starts[1:])]
+
+    low = np.minimum(starts.min(axis=0), ends.min(axis=0))
+    high = np.maximum(starts.max(axis=0), ends.max(axis=0))
+    return polylines, (float(low[0]), float(low[1]), float(high[0]), float(high[1]))
+
+
+def _fit(box: BoundingBox, size: int, margin: int) -> Tuple[float, int, int]:
+    # scale that fits the box into size pixels, and the image width and height
+    width, height = box[2] - box[0], box[3] - box[1]
+    scale = (size - 2 * margin) / max(width, height, 1e-9)
+    return scale, int(math.ceil(width * scale)) + 2 * margin, int(math.ceil(height * scale)) + 2 * margin
+
+
+def write_svg(polylines: List[array], box: BoundingBox, path: Path, size: int = 1000, margin: int = 10,
+              stroke: str = "black") -> None:
+    scale, width, height = _fit(box, size, margin)
+    with open(path, "w") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'viewBox="0 0 {width} {height}">\n')
+        f.write(f'<g fill="none" stroke="{stroke}" stroke-width="1" stroke-linejoin="round">\n')
+        for points in polylines:
+            xs = (np.frombuffer(points, dtype=np.float64)[0::2] - box[0]) * scale + margin
+            # turtle y goes up, svg y goes down
+            ys = (box[3] - np.frombuffer(points, dtype=np.float64)[1::2]) * scale + margin
+            coordinates = " ".join(f"{x:.2f},{y:.2f}" for x, y in zip(xs.tolist(), ys.tolist()))
+            f.write(f'<polyline points="{coordinates}"/>\n')
+        f.write("</g>\n</svg>\n")
+
+
+def rasterize(polylines: List[array], box: BoundingBox, size: int = 1000, margin: int = 10) -> np.ndarray:
+    """
+    Grayscale image (rows, columns) of uint8, black lines on white,
+    every line sampled once per pixel of its length.
+    """
+    scale, width, height = _fit(box, size, margin)
+    image = np.full((height, width), 255, dtype=np.uint8)
+    if not polylines:
+        return image
+
+    starts, ends = [], []
+    for points in polylines:
+        xy = np.frombuffer(points, dtype=np.float64).reshape(-1, 2)
+        starts.append(xy[:-1])
+        ends.append(xy[1:])
+    start = (np.concatenate(starts) - (box[0], box[3])) * (scale, -scale) + margin
+    end = (np.concatenate(ends) - (box[0], box[3])) * (scale, -scale) + margin
+
+    samples = np.ceil(np.hypot(*(end - start).T)).astype(np.int64) + 1
+    first = np.cumsum(samples) - samples
+    t = (np.arange(samples.sum()) - np.repeat(first, samples)) / np.repeat(np.maximum(samples - 1, 1), samples)
+    points = np.repeat(start, samples, axis=0) + t[:, np.newaxis] * np.repeat(end - start, samples, axis=0)
+    columns = np.clip(np.rint(points[:, 0]).astype(np.int64), 0, width - 1)
+    rows = np.clip(np.rint(points[:, 1]).astype(np.int64), 0, height - 1)
+    image[rows, columns] = 0
+    return image
+
+
+def write_png(image: np.ndarray, path: Path) -> None:
+    # 8 bit grayscale, every row starts with filter type 0
+    height, width = image.shape
+    raw = np.hstack((np.zeros((height, 1), dtype=np.uint8), image)).tobytes()
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def render(program: Program, path: Path, distance: float, start_angle: float = 0, size: int = 1000,
+           margin: int = 10) -> BoundingBox:
+    """
+    Writes the drawing as .svg or .png, chosen by the suffix of path,
+    fitted into size pixels. Returns the bounding box in turtle units.
+    """
+    polylines, box = trace(program, distance, (0, 0), start_angle)
+    if Path(path).suffix.lower() == ".svg":
+        write_svg(polylines, box, path, size, margin)
+    else:
+        write_png(rasterize(polylines, box, size, margin), path)
+    return box
+
+
+def main():
+    from grammars import grammars
+    import Lsystem
+
+    found = grammars()
+    parser = argparse.ArgumentParser(description="render an L-system of Lsystem.py without a display")
+    parser.add_argument("grammar", choices=list(found))
+    parser.add_argument("depth", type=int)
+    parser.add_argument("-o", "--output", type=Path, default=Path("lsystem.svg"), help=".svg or .png")
+    parser.add_argument("--size", type=int, default=1000, help="pixels of the longer side")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="for stochastic grammars, the same axiom as random.seed(seed) and build_system, "
+                             "except above L_builder.memory_budget where the rules are drawn depth first")
+    parser.add_argument("--cache", type=Path, help="directory of an AxiomCache, for deterministic grammars")
+    args = parser.parse_args()
+
+    system, _, start_angle = found[args.grammar]
+    random.seed(args.seed)
+    builder = Lsystem.L_builder(system)
+    deterministic = not Lsystem.stochastic_symbols(system.expansion_rules)
+    fits = builder.memory_budget is None or builder.predict(args.depth)["length"] <= builder.memory_budget
+    if deterministic and args.cache is not None:
+        builder.cache = AxiomCache(args.cache)
+        program = compile_string(builder.map_system(args.depth))
+    elif fits:
+        builder.build_system(args.depth)
+        program = compile_string(builder.get_axiom())
+    else:
+        # streamed without the axiom string
+        program = builder.compile_system(args.depth)
+    box = render(program, args.output, system.distance, start_angle, args.size)
+    print(f"{program.commands} commands, {len(program)} opcodes, bounding box {box}, written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+from bisect import bisect_right
+from itertools import chain
+from typing import Dict, Iterator, List, Tuple, Union
+
+"""
+Memoized L-system expansion. Every (symbol, iterations left) pair is expanded
+only once and the result is shared, so the axiom is a DAG of Rope nodes whose
+size grows with depth * number of symbols instead of with the output length.
+"""
+
+LEAF_SIZE = 256  # subtrees shorter than this are kept as plain strings
+
+
+class Rope:
+    """
+    Immutable string made of parts (strings or other ropes). Supports len(),
+    indexing, slicing and iteration without building the whole string,
+    str(rope) flattens it.
+    """
+
+    __slots__ = ("parts", "offsets")
+
+    def __init__(self, parts: Tuple[Union[str, 'Rope'], ...] = ()):
+        self.parts = parts
+        # offsets[i] is where parts[i] starts, the last one is the length
+        offsets = [0]
+        for part in parts:
+            offsets.append(offsets[-1] + len(part))
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+    def chunks(self) -> Iterator[str]:
+        # leaves from left to right, explicit stack so that depth is no issue
+        stack = [iter(self.parts)]
+        while stack:
+            for part in stack[-1]:
+                if type(part) is str:
+                    yield part
+                else:
+                    stack.append(iter(part.parts))
+                    break
+            else:
+                stack.pop()
+
+    def __iter__(self) -> Iterator[str]:
+        return chain.from_iterable(self.chunks())
+
+    def __str__(self) -> str:
+        return "".join(self.chunks())
+
+    def __repr__(self) -> str:
+        return f"Rope(length={len(self)})"
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step < 0 or start >= stop:
+                return str(self)[index] if step < 0 else ""
+            return "".join(self._pieces(start, stop))[::step]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("rope index out of range")
+        node = self
+        while type(node) is not str:
+            i = bisect_right(node.offsets, index) - 1
+            index -= node.offsets[i]
+            node = node.parts[i]
+        return node[index]
+
+    def _pieces(self, start: int, stop: int) -> Iterator[str]:
+        # parts overlapping [start, stop), only those are visited
+        first = bisect_right(self.offsets, start) - 1
+        for i in range(first, len(self.parts)):
+            offset = self.offsets[i]
+            if offset >= stop:
+                return
+            part = self.parts[i]
+            if type(part) is str:
+                yield part[max(0, start - offset):stop - offset]
+            else:
+                yield from part._pieces(max(0, start - offset), stop - offset)
+
+
+def concat(parts: List[Union[str, Rope]]) -> Union[str, Rope]:
+    parts = [part for part in parts if len(part)]
+    if sum(len(part) for part in parts) <= LEAF_SIZE:
+        return "".join(str(part) for part in parts)
+
+    # neighbouring short strings are joined into one leaf
+    merged: List[Union[str, Rope]] = []
+    for part in parts:
+        if type(part) is str and merged and type(merged[-1]) is str and len(merged[-1]) + len(part) <= LEAF_SIZE:
+            merged[-1] += part
+        else:
+            merged.append(part)
+    if len(merged) == 1:
+        return merged[0]
+    return Rope(tuple(merged))
+
+
+def expand_rope(axiom: str, expansion_rules: Dict, terminal_rules: Dict, iterations: int) -> Rope:
+    """
+    Same result as L_builder.build_system, as a Rope. Works only for
+    deterministic rules, the random choices of list rules can't be shared.
+    """
+    if any(type(rule) == list for rule in expansion_rules.values()):
+        raise ValueError("stochastic (list) rules can't be memoized, use build_system")
+
+    memo: Dict[Tuple[str, int], Union[str, Rope]] = {}
+
+    def subtree(letter: str, remaining: int) -> Union[str, Rope]:
+        if remaining <= 0 or letter not in expansion_rules:
+            # letters without expansion rule stay until the terminal rules
+            return terminal_rules.get(letter, "")
+        key = (letter, remaining)
+        if key not in memo:
+            memo[key] = concat([subtree(child, remaining - 1) for child in expansion_rules[letter]])
+        return memo[key]
+
+    result = concat([subtree(letter, iterations) for letter in axiom])
+    if type(result) is str:
+        return Rope((result,) if result else ())
+    return result
@@ -0,0 +1,272 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from forces import GRAVITATION_CONSTANT, pairwise_accelerations
+
+# cells smaller than 1/2**MAX_DEPTH of the whole system are not split anymore
+MAX_DEPTH = 30
+# targets walked through the tree at once, bounds the size of the (target, node) frontier
+TARGETS_PER_CHUNK = 4096
+
+
+class QuadTree:
+    """
+        2D quadtree over point masses, built level by level with array operations.
+        Every node keeps its total mass, center of mass, side length and a contiguous range of children.
+        With velocities it also keeps the velocity of the center of mass, for jerks.
+    """
+
+    def __init__(self, positions: np.ndarray, masses: np.ndarray, max_depth: int = MAX_DEPTH,
+                 velocities: Optional[np.ndarray] = None):
+        n = len(masses)
+        lower = positions.min(axis=0) if n else np.zeros(2)
+        size = float((positions.max(axis=0) - lower).max()) if n else 0.0
+        size = size * (1 + 1e-9) if size > 0 else 1.0
+        unit = (positions - lower) / size  # every body is inside [0, 1) x [0, 1)
+
+        node_mass = [np.array([masses.sum()])]
+        node_com = [np.array([_center_of_mass(positions, masses)])] if n else [np.zeros((1, 2))]
+        node_cov = [np.array([_center_of_mass(velocities, masses)]) if n else np.zeros((1, 2))] \
+            if velocities is not None else None
+        node_size = [np.array([size])]
+        node_leaf = [np.array([n <= 1])]
+        node_parent = [np.array([-1])]
+        n_nodes = 1
+
+        active = np.arange(n) if n > 1 else np.zeros(0, dtype=np.intp)
+        active_parent = np.zeros(len(active), dtype=np.intp)
+
+        for level in range(1, max_depth + 1):
+            if len(active) == 0:
+                break
+            cells = 2**level
+            cell = np.minimum((unit[active] * cells).astype(np.int64), cells - 1)
+            keys = cell[:, 0] * cells + cell[:, 1]
+            _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+            inverse = inverse.reshape(-1)
+
+            # children of one parent have to be next to each other
+            parents = active_parent[first]
+            order = np.argsort(parents, kind="stable")
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+
+            level_masses = np.bincount(inverse, masses[active], minlength=len(counts))
+            level_com = np.stack([
+                np.bincount(inverse, masses[active] * positions[active, 0], minlength=len(counts)),
+                np.bincount(inverse, masses[active] * positions[active, 1], minlength=len(counts)),
+            ], axis=1)
+            massless = level_masses == 0
+            level_com[~massless] /= level_masses[~massless, np.newaxis]
+            if massless.any():
+                level_com[massless] = np.stack([
+                    np.bincount(inverse, positions[active, 0], minlength=len(counts)),
+                    np.bincount(inverse, positions[active, 1], minlength=len(counts)),
+                ], axis=1)[massless] / counts[massless, np.newaxis]
+
+            # single bodies keep their exact position, so that a body finds itself at zero distance
+            single = counts == 1
+            level_com[single] = positions[active[first[single]]]
+            if node_cov is not None:
+                node_cov.append(_level_center_of_mass(velocities[active], masses[active], inverse, level_masses,
+                                                      counts)[order])
+
+            leaf = single | (level == max_depth)
+            node_mass.append(level_masses[order])
+            node_com.append(level_com[order])
+            node_size.append(np.full(len(counts), size / cells))
+            node_leaf.append(leaf[order])
+            node_parent.append(parents[order])
+
+            node_ids = n_nodes + rank[inverse]
+            n_nodes += len(counts)
+
+            split = ~leaf[inverse]
+            active = active[split]
+            active_parent = node_ids[split]
+
+        self.mass = np.concatenate(node_mass)
+        self.com = np.concatenate(node_com)
+        self.size = np.concatenate(node_size)
+        self.leaf = np.concatenate(node_leaf)
+        self.cov = np.concatenate(node_cov) if node_cov is not None else None
+        parent = np.concatenate(node_parent)
+
+        self.child_count = np.bincount(parent[1:], minlength=n_nodes)
+        self.child_start = np.zeros(n_nodes, dtype=np.intp)
+        # nodes are stored sorted by parent, so the first child follows the children of all previous parents
+        self.child_start[:] = 1 + np.cumsum(self.child_count) - self.child_count
+
+    def __len__(self) -> int:
+        return len(self.mass)
+
+    def walk(self, targets: np.ndarray, theta: float = 0.5, softening: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Returns accelerations and potentials at targets. A node is used as a single mass
+            when size / distance < theta, theta = 0 gives the exact direct sum.
+        """
+        accelerations = np.zeros((len(targets), 2))
+        potentials = np.zeros(len(targets))
+        for start in range(0, len(targets), TARGETS_PER_CHUNK):
+            end = min(start + TARGETS_PER_CHUNK, len(targets))
+            accelerations[start:end], potentials[start:end] = self._walk_chunk(targets[start:end], theta, softening)
+        accelerations *= GRAVITATION_CONSTANT
+        potentials *= -GRAVITATION_CONSTANT
+        return accelerations, potentials
+
+    def walk_jerks(self, targets: np.ndarray, target_velocities: np.ndarray, theta: float = 0.5,
+                   softening: float = 0.0) -> np.ndarray:
+        """
+            Time derivatives of the accelerations at targets moving with target_velocities,
+            accepted nodes move with the velocity of their center of mass. Needs a tree built with velocities.
+        """
+        jerks = np.zeros((len(targets), 2))
+        for start in range(0, len(targets), TARGETS_PER_CHUNK):
+            end = min(start + TARGETS_PER_CHUNK, len(targets))
+            jerks[start:end] = self._jerk_chunk(targets[start:end], target_velocities[start:end], theta, softening)
+        return jerks * GRAVITATION_CONSTANT
+
+    def _jerk_chunk(self, targets: np.ndarray, target_velocities: np.ndarray, theta: float,
+                    softening: float) -> np.ndarray:
+        n = len(targets)
+        jerk_x = np.zeros(n)
+        jerk_y = np.zeros(n)
+
+        target = np.arange(n)
+        node = np.zeros(n, dtype=np.intp)
+        while len(target):
+            diff = self.com[node] - targets[target]
+            r2 = np.einsum('ij,ij->i', diff, diff)
+            accept = self.leaf[node] | (self.size[node]**2 < theta**2 * r2)
+
+            t, d, r = target[accept], diff[accept], r2[accept]
+            accepted = node[accept]
+            valid = r > 0  # a body does not pull on itself
+            t, d, accepted = t[valid], d[valid], accepted[valid]
+            r = r[valid] + softening**2
+            v = self.cov[accepted] - target_velocities[t]
+            weight = self.mass[accepted] / (r * np.sqrt(r))
+            rv = 3 * np.einsum('ij,ij->i', d, v) / r
+            jerk_x += np.bincount(t, weight * (v[:, 0] - rv * d[:, 0]), minlength=n)
+            jerk_y += np.bincount(t, weight * (v[:, 1] - rv * d[:, 1]), minlength=n)
+
+            opened_target, opened_node = target[~accept], node[~accept]
+            counts = self.child_count[opened_node]
+            target = np.repeat(opened_target, counts)
+            offsets = np.arange(len(target)) - np.repeat(np.cumsum(counts) - counts, counts)
+            node = np.repeat(self.child_start[opened_node], counts) + offsets
+
+        return np.stack([jerk_x, jerk_y], axis=1)
+
+    def _walk_chunk(self, targets: np.ndarray, theta: float, softening: float) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(targets)
+        acc_x = np.zeros(n)
+        acc_y = np.zeros(n)
+        potentials = np.zeros(n)
+
+        # frontier of (target, node) pairs that still have to be resolved
+        target = np.arange(n)
+        node = np.zeros(n, dtype=np.intp)
+        while len(target):
+            diff = self.com[node] - targets[target]
+            r2 = np.einsum('ij,ij->i', diff, diff)
+            accept = self.leaf[node] | (self.size[node]**2 < theta**2 * r2)
+
+            t, d, r = target[accept], diff[accept], r2[accept]
+            m = self.mass[node[accept]]
+            valid = r > 0  # a body does not pull on itself
+            t, d, m = t[valid], d[valid], m[valid]
+            r = r[valid] + softening**2
+            inv_r = 1 / np.sqrt(r)
+            weight = m * inv_r / r
+            acc_x += np.bincount(t, weight * d[:, 0], minlength=n)
+            acc_y += np.bincount(t, weight * d[:, 1], minlength=n)
+            potentials += np.bincount(t, m * inv_r, minlength=n)
+
+            opened_target, opened_node = target[~accept], node[~accept]
+            counts = self.child_count[opened_node]
+            target = np.repeat(opened_target, counts)
+            offsets = np.arange(len(target)) - np.repeat(np.cumsum(counts) - counts, counts)
+            node = np.repeat(self.child_start[opened_node], counts) + offsets
+
+        return np.stack([acc_x, acc_y], axis=1), potentials
+
+
+def _level_center_of_mass(values: np.ndarray, masses: np.ndarray, inverse: np.ndarray, level_masses: np.ndarray,
+                          counts: np.ndarray) -> np.ndarray:
+    # mass weighted mean of values in every cell of a level, plain mean in massless cells
+    mean = np.stack([np.bincount(inverse, masses * values[:, 0], minlength=len(counts)),
+                     np.bincount(inverse, masses * values[:, 1], minlength=len(counts))], axis=1)
+    massless = level_masses == 0
+    mean[~massless] /= level_masses[~massless, np.newaxis]
+    if massless.any():
+        mean[massless] = np.stack([np.bincount(inverse, values[:, 0], minlength=len(counts)),
+                                   np.bincount(inverse, values[:, 1], minlength=len(counts))],
+                                  axis=1)[massless] / counts[massless, np.newaxis]
+    return mean
+
+
+def _center_of_mass(positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+    if len(masses) == 1:
+        return positions[0]
+    total = masses.sum()
+    if total == 0:
+        return positions.mean(axis=0)
+    return (positions * masses[:, np.newaxis]).sum(axis=0) / total
+
+
+def barnes_hut_accelerations(targets: np.ndarray,
+                             sources: np.ndarray,
+                             masses: np.ndarray,
+                             softening: float = 0.0,
+                             theta: float = 0.5) -> np.ndarray:
+    return QuadTree(sources, masses).walk(targets, theta, softening)[0]
+
+
+def barnes_hut_potentials(targets: np.ndarray,
+                          sources: np.ndarray,
+                          masses: np.ndarray,
+                          softening: float = 0.0,
+                          theta: float = 0.5) -> np.ndarray:
+    return QuadTree(sources, masses).walk(targets, theta, softening)[1]
+
+
+def barnes_hut_jerks(targets: np.ndarray,
+                     target_velocities: np.ndarray,
+                     sources: np.ndarray,
+                     source_velocities: np.ndarray,
+                     masses: np.ndarray,
+                     softening: float = 0.0,
+                     theta: float = 0.5) -> np.ndarray:
+    return QuadTree(sources, masses, velocities=source_velocities).walk_jerks(targets, target_velocities,
+                                                                             theta, softening)
+
+
+def force_error(targets: np.ndarray,
+                sources: np.ndarray,
+                masses: np.ndarray,
+                theta: float = 0.5,
+                softening: float = 0.0,
+                sample_size: int = 100,
+                seed: int = 0) -> Dict[str, float]:
+    """
+        Relative error of Barnes-Hut accelerations against direct summation,
+        measured on a random sample of bodies so that the check itself stays cheap.
+    """
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(targets), size=min(sample_size, len(targets)), replace=False)
+    approximate = QuadTree(sources, masses).walk(targets[sample], theta, softening)[0]
+    exact = pairwise_accelerations(targets[sample], sources, masses, softening)
+
+    exact_norm = np.linalg.norm(exact, axis=1)
+    nonzero = exact_norm > 0
+    relative = np.linalg.norm(approximate - exact, axis=1)[nonzero] / exact_norm[nonzero]
+    if len(relative) == 0:
+        relative = np.zeros(1)
+    return {
+        "sample": int(len(sample)),
+        "median": float(np.median(relative)),
+        "rms": float(np.sqrt(np.mean(relative**2))),
+        "max": float(relative.max()),
+    }
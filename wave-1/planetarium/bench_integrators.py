@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+# compares the integrators on the solar system: how far the energy drifts and how much wall-clock time it takes
+# run from this directory: python3 bench_integrators.py
+
+import argparse
+import time
+
+from gravity import Simulation
+from initial_states import solar_bodies
+from integrators import INTEGRATORS
+
+YEAR = 365 * 24 * 60 * 60
+
+
+def run(integrator: str, step_size: float, sim_time: float, planets: int, samples: int = 100):
+    simulation = Simulation(solar_bodies(only_first_n_planets=planets), integrator=integrator)
+    initial_energy = simulation.total_energy()
+    steps = max(1, int(sim_time // step_size))
+    sample_every = max(1, steps // samples)
+
+    drift = 0.0
+    elapsed = 0.0
+    for i in range(steps):
+        start = time.perf_counter()
+        simulation.step(step_size)
+        elapsed += time.perf_counter() - start
+        if (i + 1) % sample_every == 0:
+            drift = max(drift, abs((simulation.total_energy() - initial_energy) / initial_energy))
+
+    return steps, elapsed, drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="energy drift of the integrators on solar_bodies()")
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--planets", type=int, default=4)
+    parser.add_argument("--step-sizes", type=float, nargs="+", default=[10**4, 10**5, 10**6])
+    parser.add_argument("--integrators", nargs="+", default=list(INTEGRATORS), choices=list(INTEGRATORS))
+    args = parser.parse_args()
+
+    print(f"{'integrator':<10} {'step [s]':>10} {'steps':>8} {'wall [s]':>9} {'steps/s':>10} {'max drift':>10} {'drift/s':>10}")
+    for integrator in args.integrators:
+        for step_size in args.step_sizes:
+            steps, elapsed, drift = run(integrator, step_size, args.years * YEAR, args.planets)
+            print(f"{integrator:<10} {step_size:>10.0f} {steps:>8} {elapsed:>9.3f} {steps / elapsed:>10.0f} "
+                  f"{drift:>10.2e} {drift / elapsed:>10.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# pure python gravity steps of point_gravity, measured with tracemalloc, runs without numpy:
+# how many Points one simulation step creates, how many memory blocks it leaves allocated
+# (tracemalloc snapshot statistics) and its peak memory
+# run from this directory: python3 bench_point.py
+
+import argparse
+import math
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import List
+
+from constants import GRAVITATION_CONSTANT
+from point import Point, PointArray, Vector
+from point_gravity import step_point_arrays, step_points
+
+
+def step_allocating(locations: List[Point], motion_vectors: List[Vector], masses: List[float], step_size: float):
+    # the original Body.acceleration + update_pos, a new Point for every operation
+    for i in range(len(locations)):
+        for j in range(len(locations)):
+            if i != j:
+                distance = locations[i].distance(locations[j])
+                location_diff = locations[j] - locations[i]
+                abs_accel = GRAVITATION_CONSTANT * masses[j] / distance**2
+                motion_vectors[i] = motion_vectors[i] + Vector(abs_accel * location_diff.x / distance * step_size,
+                                                               abs_accel * location_diff.y / distance * step_size)
+    for i in range(len(locations)):
+        locations[i] = locations[i] + motion_vectors[i] * step_size
+
+
+def count_points(function, *args) -> int:
+    # every new Point runs Point.__init__, so count those calls
+    created = 0
+    init = Point.__init__.__code__
+
+    def profile(frame, event, _):
+        nonlocal created
+        if event == "call" and frame.f_code is init:
+            created += 1
+
+    sys.setprofile(profile)
+    try:
+        function(*args)
+    finally:
+        sys.setprofile(None)
+    return created
+
+
+def measure(name: str, function, make_state, steps: int, step_size: float):
+    state = make_state()
+    points = count_points(function, *state, step_size)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    function(*state, step_size)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # memory blocks the step left allocated, counted per line; temporaries freed within the step are
+    # only seen by the Point count and the peak
+    blocks = sum(stat.count for stat in after.statistics("lineno")) - \
+        sum(stat.count for stat in before.statistics("lineno"))
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        function(*state, step_size)
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<12} {points:>12} {blocks:>12} {peak - baseline:>14} {steps / elapsed:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Points, memory blocks and peak memory of one pure python gravity step")
+    parser.add_argument("--bodies", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--step-size", type=float, default=10**5)
+    args = parser.parse_args()
+
+    # a star and bodies on circular orbits around it, built without initial_states (it needs numpy)
+    star_mass, radius = 2 * 10**30, 1.5 * 10**11
+    speed = math.sqrt(GRAVITATION_CONSTANT * star_mass / radius)
+    angles = [2 * math.pi * i / (args.bodies - 1) for i in range(args.bodies - 1)]
+
+    def as_points():
+        return ([Point(0.0, 0.0)] + [Point(radius * math.cos(a), radius * math.sin(a)) for a in angles],
+                [Vector(0.0, 0.0)] + [Vector(-speed * math.sin(a), speed * math.cos(a)) for a in angles],
+                [star_mass] + [6 * 10**24] * len(angles))
+
+    def as_arrays():
+        locations, motion_vectors, masses = as_points()
+        return PointArray(locations), PointArray(motion_vectors), array("d", masses)
+
+    print(f"{args.bodies} bodies")
+    print(f"{'step':<12} {'Points/step':>12} {'blocks/step':>12} {'peak bytes':>14} {'steps/s':>10}")
+    measure("allocating", step_allocating, as_points, args.steps, args.step_size)
+    measure("in place", step_points, as_points, args.steps, args.step_size)
+    measure("batch", step_point_arrays, as_arrays, args.steps, args.step_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+# benchmarks of the planetarium for growing number of bodies, results go to a JSON file
+# every registered integrator and solver is measured, so new ones show up here on their own
+# run from this directory: python3 bench_suite.py -o bench.json
+# compare two runs (e.g. two commits): python3 bench_suite.py --compare old.json new.json
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from engine import SOLVERS
+from gravity import Simulation, calculate_system_energy
+from initial_states import n_nary_stable_system
+from integrators import INTEGRATORS
+from renderer import TrailRenderer
+from worker import SimulationWorker
+
+SCALE = 10**9
+KEY_FIELDS = ("benchmark", "bodies", "integrator", "solver")
+
+
+class StubCanvas(dict):
+    """
+        Stands in for tkinter.Canvas, so the renderer does all its work except the drawing.
+    """
+
+    def __init__(self, width: int = 800, height: int = 800):
+        super().__init__(width=width, height=height)
+        self.items = 0
+
+    def create_line(self, *args, **kwargs) -> int:
+        self.items += 1
+        return self.items
+
+    create_oval = create_line
+
+    def coords(self, *args) -> None:
+        pass
+
+    def itemconfigure(self, *args, **kwargs) -> None:
+        pass
+
+    def delete(self, *args) -> None:
+        pass
+
+
+def make_simulation(n: int, integrator: str = "leapfrog", solver: str = "direct") -> Simulation:
+    return Simulation(n_nary_stable_system(n, scale=SCALE, screen_size=(800, 800)), solver=solver, integrator=integrator)
+
+
+def peak_memory(function: Callable[[], None]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure(run: Callable[[], None], make_run: Callable[[], Callable[[], None]], repeats: int) -> Dict:
+    """
+        Runs `run` `repeats` times for the timing, and once more from a fresh state under tracemalloc,
+        which slows python code down too much to be timed at the same time.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    wall_time = time.perf_counter() - start
+    traced = make_run()
+    peak = peak_memory(traced)
+    getattr(traced, "close", lambda: None)()
+    return {
+        "repeats": repeats,
+        "wall_time": wall_time,
+        "per_sec": repeats / wall_time,
+        "peak_bytes": peak,
+    }
+
+
+def bench_legacy_step(n: int, steps: int, step_size: float) -> Dict:
+    # the original main loop: Body.acceleration of every body, then update_pos of every body
+    def make_run():
+        simulation = make_simulation(n)
+        bodies = simulation.bodies
+
+        def run():
+            for body in bodies:
+                body.acceleration(bodies, step_size)
+            for body in bodies:
+                body.update_pos(step_size)
+        run.simulation = simulation
+        return run
+
+    run = make_run()
+    initial_energy = run.simulation.total_energy()
+    result = measure(run, make_run, steps)
+    result["energy_drift"] = abs((run.simulation.total_energy() - initial_energy) / initial_energy)
+    result["sim_time"] = steps * step_size
+    return result
+
+
+def bench_step(n: int, integrator: str, solver: str, steps: int, step_size: float) -> Dict:
+    def make_run():
+        simulation = make_simulation(n, integrator, solver)
+
+        def run():
+            simulation.step(step_size)
+        run.simulation = simulation
+        return run
+
+    run = make_run()
+    initial_energy = run.simulation.total_energy()
+    result = measure(run, make_run, steps)
+    result["energy_drift"] = abs((run.simulation.total_energy() - initial_energy) / initial_energy)
+    result["sim_time"] = steps * step_size
+    return result
+
+
+def bench_energy(n: int, theta: Optional[float], repeats: int) -> Dict:
+    def make_run():
+        bodies = make_simulation(n).bodies
+        return lambda: calculate_system_energy(bodies, theta)
+
+    return measure(make_run(), make_run, repeats)
+
+
+def bench_tick(n: int, integrator: str, frames: int, step_size: float, time_per_draw: float) -> Dict:
+    """
+        The gui tick without a window: grant simulated time to the worker thread,
+        wait for the snapshot and feed it to the trail renderer on a stub canvas.
+    """
+    def make_run():
+        simulation = make_simulation(n, integrator)
+        worker = SimulationWorker(simulation, step_size)
+        renderer = TrailRenderer(StubCanvas(), SCALE)
+        worker.start()
+
+        def run():
+            target = worker.latest().sim_time + time_per_draw
+            worker.grant(time_per_draw)
+            snapshot = worker.latest()
+            while snapshot.sim_time < target * (1 - 1e-12):
+                time.sleep(0.0001)
+                snapshot = worker.latest()
+            renderer.update(snapshot.positions, snapshot.ids)
+        run.simulation = simulation
+        run.worker = worker
+        run.close = worker.stop
+        return run
+
+    run = make_run()
+    initial_energy = run.simulation.total_energy()
+    result = measure(run, make_run, frames)
+    run.close()
+    run.worker.join()
+    result["energy_drift"] = abs((run.simulation.total_energy() - initial_energy) / initial_energy)
+    # frames * time_per_draw, unlike the step rows with steps * step_size
+    result["sim_time"] = run.worker.sim_time
+    return result
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def run_suite(sizes: List[int], steps: int, step_size: float, frames: int, time_per_draw: float,
+              legacy_max: int) -> List[Dict]:
+    results = []
+
+    def record(benchmark: str, n: int, integrator: Optional[str], solver: Optional[str], result: Dict) -> None:
+        row = {"benchmark": benchmark, "bodies": n, "integrator": integrator, "solver": solver, **result}
+        results.append(row)
+        drift = row.get("energy_drift")
+        sim_time = row.get("sim_time")
+        print(f"{benchmark:<8} {n:>6} {integrator or '-':<10} {solver or '-':<10} {row['per_sec']:>10.1f} "
+              f"{row['peak_bytes']:>12} {'-' if drift is None else f'{drift:.2e}':>10} "
+              f"{'-' if sim_time is None else f'{sim_time:.2e}':>10}", flush=True)
+
+    print(f"{'bench':<8} {'bodies':>6} {'integrator':<10} {'solver':<10} {'per sec':>10} {'peak bytes':>12} "
+          f"{'drift':>10} {'over s':>10}")
+    for n in sizes:
+        if n <= legacy_max:
+            record("legacy", n, None, "direct", bench_legacy_step(n, steps, step_size))
+        for integrator in INTEGRATORS:
+            for solver in SOLVERS:
+                record("step", n, integrator, solver, bench_step(n, integrator, solver, steps, step_size))
+        record("energy", n, None, "direct", bench_energy(n, None, steps))
+        record("energy", n, None, "barnes_hut", bench_energy(n, 0.5, steps))
+        for integrator in INTEGRATORS:
+            record("tick", n, integrator, "direct", bench_tick(n, integrator, frames, step_size, time_per_draw))
+    return results
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    """
+        Prints the speedup of every benchmark present in both files.
+    """
+    with open(old_path) as f:
+        old = {tuple(row[k] for k in KEY_FIELDS): row for row in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    print(f"{'bench':<8} {'bodies':>6} {'integrator':<10} {'solver':<10} {'speedup':>8} {'memory':>8}")
+    for row in new:
+        before = old.get(tuple(row[k] for k in KEY_FIELDS))
+        if before is None:
+            continue
+        print(f"{row['benchmark']:<8} {row['bodies']:>6} {row['integrator'] or '-':<10} {row['solver'] or '-':<10} "
+              f"{row['per_sec'] / before['per_sec']:>7.2f}x {row['peak_bytes'] / max(1, before['peak_bytes']):>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="planetarium benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500], help="add 5000 for the large runs")
+    parser.add_argument("--steps", type=int, default=10, help="steps (and energy evaluations) per benchmark")
+    parser.add_argument("--step-size", type=float, default=10**5)
+    parser.add_argument("--frames", type=int, default=10, help="ticks of the headless gui loop")
+    parser.add_argument("--time-per-draw", type=float, default=10**6, help="simulated seconds per tick")
+    parser.add_argument("--legacy-max", type=int, default=500,
+                        help="largest n for the Body.acceleration loop, about 27 s per step at 5000")
+    parser.add_argument("-o", "--output", type=Path, default=Path("bench.json"))
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("OLD", "NEW"), help="only compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_suite(args.sizes, args.steps, args.step_size, args.frames, args.time_per_draw, args.legacy_max)
+    with open(args.output, "w") as f:
+        json.dump({
+            "environment": environment(),
+            "parameters": {
+                "steps": args.steps,
+                "step_size": args.step_size,
+                "frames": args.frames,
+                "time_per_draw": args.time_per_draw,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from engine import Simulation
+
+# columns of a catalog, named and scaled like planets.json:
+# mass in 10**24 kg, distanceFromSun in 10**9 m, orbitalVelocity in km/s, angle (optional) in degrees
+CATALOG_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("name", "U32"),  # longer names are cut
+    ("mass", np.float64),
+    ("distanceFromSun", np.float64),
+    ("orbitalVelocity", np.float64),
+    ("angle", np.float64),
+])
+_COLUMNS = {name: i for i, name in enumerate(CATALOG_DTYPE.names)}
+_DEFAULTS = (0, "", 0.0, 0.0, 0.0, 0.0)
+
+CHUNK_SIZE = 2**16  # records parsed and filtered at once
+_BLOCK_SIZE = 2**20  # characters read from a json file at once
+_BETWEEN_RECORDS = re.compile(r"[\s,\[\]]*")
+
+
+def _record(pairs) -> tuple:
+    # object_pairs_hook of the json decoder, the record goes straight to a tuple without a dict in between
+    values = list(_DEFAULTS)
+    for key, value in pairs:
+        column = _COLUMNS.get(key)
+        if column is not None and value is not None:
+            values[column] = value
+    return tuple(values)
+
+
+def _json_records(path: Path) -> Iterator[tuple]:
+    """
+        Records of a JSON Lines file or of a JSON array of objects (like planets.json),
+        decoded one after another from a small buffer.
+    """
+    decoder = json.JSONDecoder(object_pairs_hook=_record)
+    buffer = ""
+    with open(path) as f:
+        while True:
+            block = f.read(_BLOCK_SIZE)
+            position = 0
+            buffer += block
+            while True:
+                position = _BETWEEN_RECORDS.match(buffer, position).end()
+                if position == len(buffer):
+                    break
+                try:
+                    record, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if not block:
+                        raise
+                    break  # the record continues in the next block
+                yield record
+            buffer = buffer[position:]
+            if not block:
+                return
+
+
+def _csv_records(path: Path) -> Iterator[tuple]:
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        # catalog column -> csv column, missing ones keep their default
+        positions = [header.index(name) if name in header else None for name in CATALOG_DTYPE.names]
+        for row in reader:
+            if row:
+                yield tuple(default if i is None or row[i] == "" else row[i]
+                            for i, default in zip(positions, _DEFAULTS))
+
+
+def _chunks(path: Path, chunk_size: int) -> Iterator[np.ndarray]:
+    records = _csv_records(path) if Path(path).suffix.lower() == ".csv" else _json_records(path)
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield np.array(chunk, dtype=CATALOG_DTYPE)
+            chunk = []
+    if chunk:
+        yield np.array(chunk, dtype=CATALOG_DTYPE)
+
+
+def cache_path(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".npy")
+
+
+def _select(records: np.ndarray,
+            id_range: Optional[Tuple[int, int]],
+            min_mass: Optional[float],
+            distance_band: Optional[Tuple[float, float]]) -> np.ndarray:
+    mask = np.ones(len(records), dtype=bool)
+    if id_range is not None:
+        mask &= (records["id"] >= id_range[0]) & (records["id"] <= id_range[1])
+    if min_mass is not None:
+        mask &= records["mass"] >= min_mass
+    if distance_band is not None:
+        mask &= (records["distanceFromSun"] >= distance_band[0]) & (records["distanceFromSun"] <= distance_band[1])
+    return records[mask]
+
+
+def read_catalog(path: Path,
+                 id_range: Optional[Tuple[int, int]] = None,
+                 min_mass: Optional[float] = None,
+                 distance_band: Optional[Tuple[float, float]] = None,
+                 cache: bool = True,
+                 chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+        Reads a .jsonl, .json or .csv catalog into a CATALOG_DTYPE array, keeping only the records
+        with id in id_range, mass >= min_mass and distanceFromSun in distance_band (bounds included).
+        Filters run on every chunk while streaming, so memory depends on what is kept, not on the catalog.
+        With cache the whole catalog is written to a .npy sidecar, later reads only map it.
+    """
+    sidecar = cache_path(path)
+    if cache and sidecar.exists() and sidecar.stat().st_mtime >= Path(path).stat().st_mtime:
+        return _select(np.load(sidecar, mmap_mode="r"), id_range, min_mass, distance_band)
+
+    kept = []
+    count = 0
+    # the number of records is known only at the end, so the data goes to a temporary file first
+    raw = tempfile.NamedTemporaryFile(dir=sidecar.parent, suffix=".tmp", delete=False) if cache else None
+    try:
+        for chunk in _chunks(path, chunk_size):
+            if raw is not None:
+                raw.write(chunk.tobytes())
+            count += len(chunk)
+            kept.append(_select(chunk, id_range, min_mass, distance_band))
+        if raw is not None:
+            raw.close()
+            _write_sidecar(sidecar, raw.name, count)
+    finally:
+        if raw is not None:
+            raw.close()
+            os.unlink(raw.name)
+
+    if not kept:
+        return np.zeros(0, dtype=CATALOG_DTYPE)
+    return np.concatenate(kept)
+
+
+def _write_sidecar(sidecar: Path, raw_path: str, count: int) -> None:
+    temporary = sidecar.with_name(sidecar.name + ".part")
+    with open(temporary, "wb") as f, open(raw_path, "rb") as raw:
+        np.lib.format.write_array_header_1_0(f, {"descr": np.lib.format.dtype_to_descr(CATALOG_DTYPE),
+                                                 "fortran_order": False,
+                                                 "shape": (count,)})
+        shutil.copyfileobj(raw, f)
+    os.replace(temporary, sidecar)
+
+
+def load_catalog(simulation: Simulation,
+                 path: Path,
+                 id_range: Optional[Tuple[int, int]] = None,
+                 min_mass: Optional[float] = None,
+                 distance_band: Optional[Tuple[float, float]] = None,
+                 test_particles: bool = False,
+                 cache: bool = True) -> int:
+    """
+        Adds the bodies of a catalog straight into the arrays of simulation, on circular-like orbits
+        around the origin like solar_bodies(). Returns the index of the first one.
+        Millions of minor bodies are best loaded as test particles.
+    """
+    records = read_catalog(path, id_range, min_mass, distance_band, cache)
+    distances = records["distanceFromSun"] * 10**9  # meters
+    speeds = records["orbitalVelocity"] * 10**3  # meters per second
+    angles = np.radians(records["angle"])
+    cos, sin = np.cos(angles), np.sin(angles)
+
+    return simulation.append_arrays(
+        np.column_stack((cos * distances, sin * distances)),
+        np.column_stack((-sin * speeds, cos * speeds)),
+        records["mass"] * 10**24,  # kg
+        records["name"].tolist(),
+        np.full(len(records), test_particles))
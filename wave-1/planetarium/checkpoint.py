@@ -0,0 +1,79 @@
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from engine import Simulation
+
+FORMAT_VERSION = 1
+
+
+def save_checkpoint(path: Path, simulation: Simulation, steps: int, sim_time: float, step_size: float) -> None:
+    """
+        Writes the full state as an uncompressed .npz, the arrays are stored as raw binary
+        so loading even 100k bodies is a few memory copies.
+    """
+    state = {
+        "version": np.array(FORMAT_VERSION),
+        "positions": simulation.positions,
+        "velocities": simulation.velocities,
+        "masses": simulation.masses,
+        "test_particles": simulation.test_particles,
+        "names": np.array(simulation.names, dtype=str),
+        "steps": np.array(steps),
+        "sim_time": np.array(sim_time),
+        "step_size": np.array(step_size),
+        "integrator": np.array(simulation.integrator),
+        "solver": np.array(simulation.solver),
+        "theta": np.array(simulation.theta),
+        "softening": np.array(simulation.softening),
+        "collision_radius": np.array(simulation.collision_radius),
+        "block_eta": np.array(simulation.block_eta),
+        "block_max_level": np.array(simulation.block_max_level),
+        "force_evaluations": np.array(simulation.force_evaluations),
+        "fixed_step_evaluations": np.array(simulation.fixed_step_evaluations),
+    }
+    # integrator state, leapfrog and block steps start from the cached accelerations
+    if simulation._accelerations is not None:
+        state["accelerations"] = simulation._accelerations
+    with open(path, "wb") as f:
+        np.savez(f, **state)
+
+
+def read_checkpoint(path: Path) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        if int(data["version"]) != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported checkpoint version {int(data['version'])}")
+        return {key: data[key] for key in data.files}
+
+
+def restore_checkpoint(simulation: Simulation, data: Dict[str, np.ndarray]) -> Dict:
+    """
+        Replaces the state of simulation by the checkpoint, returns steps, sim_time and step_size.
+    """
+    simulation.clear()
+    simulation.append_arrays(data["positions"], data["velocities"], data["masses"],
+                             data["names"].tolist(), data["test_particles"])
+    simulation.integrator = str(data["integrator"])
+    simulation.solver = str(data["solver"])
+    simulation.theta = float(data["theta"])
+    simulation.softening = float(data["softening"])
+    if "collision_radius" in data:
+        simulation.collision_radius = float(data["collision_radius"])
+    simulation.block_eta = float(data["block_eta"])
+    simulation.block_max_level = int(data["block_max_level"])
+    simulation.force_evaluations = int(data["force_evaluations"])
+    simulation.fixed_step_evaluations = int(data["fixed_step_evaluations"])
+    if "accelerations" in data:
+        simulation._accelerations = data["accelerations"].copy()
+
+    return {
+        "steps": int(data["steps"]),
+        "sim_time": float(data["sim_time"]),
+        "step_size": float(data["step_size"]),
+    }
+
+
+def load_checkpoint(path: Path) -> Tuple[Simulation, Dict]:
+    simulation = Simulation()
+    return simulation, restore_checkpoint(simulation, read_checkpoint(path))
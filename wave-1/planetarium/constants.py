@@ -0,0 +1,3 @@
+# physical constants, without numpy so that the pure python code can use them
+
+GRAVITATION_CONSTANT = 6.67430 * 10**(-11)
@@ -0,0 +1,492 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import barnes_hut
+from integrators import INTEGRATORS
+from forces import GRAVITATION_CONSTANT, pairwise_accelerations, pairwise_jerks, pairwise_potentials
+from point import Point, Vector
+from spatial_hash import SpatialHash
+
+
+def _direct_accelerations(targets, sources, masses, softening, theta):
+    return pairwise_accelerations(targets, sources, masses, softening)
+
+
+def _direct_potentials(targets, sources, masses, softening, theta):
+    return pairwise_potentials(targets, sources, masses, softening)
+
+
+# name -> (accelerations, potentials), both called as f(targets, sources, masses, softening, theta)
+SOLVERS = {
+    "direct": (_direct_accelerations, _direct_potentials),
+    "barnes_hut": (barnes_hut.barnes_hut_accelerations, barnes_hut.barnes_hut_potentials),
+}
+
+
+class _StateView(Point):
+    """
+        Point that reads and writes one row of a simulation array,
+        so `body.location.x = 5` keeps working.
+    """
+
+    __slots__ = ("_body", "_field")
+
+    def __init__(self, body: 'Body', field: str) -> None:
+        self._body = body
+        self._field = field
+
+    def _row(self) -> np.ndarray:
+        return getattr(self._body._simulation, self._field)[self._body._index]
+
+    @property
+    def x(self) -> float:
+        return float(self._row()[0])
+
+    @x.setter
+    def x(self, value: float) -> None:
+        self._row()[0] = value
+        self._body._simulation.touch()
+
+    @property
+    def y(self) -> float:
+        return float(self._row()[1])
+
+    @y.setter
+    def y(self, value: float) -> None:
+        self._row()[1] = value
+        self._body._simulation.touch()
+
+
+class Body:
+    """
+        Thin view over one row of a Simulation. A body created on its own lives in a private
+        one-body simulation until it is added to a bigger one.
+    """
+
+    def __init__(self,
+                 location: Point,
+                 mass: float,
+                 motion_vector: Vector,
+                 name: str,
+                 test_particle: bool = False,
+                 simulation: Optional['Simulation'] = None):
+
+        if simulation is None:
+            simulation = Simulation()
+        self._simulation = simulation
+        self._index = simulation.append_arrays(
+            np.array([[location.x, location.y]], dtype=np.float64),
+            np.array([[motion_vector.x, motion_vector.y]], dtype=np.float64),
+            np.array([mass], dtype=np.float64),
+            [name],
+            np.array([test_particle]))
+        simulation._views[self._index] = self
+
+    @property
+    def simulation(self) -> 'Simulation':
+        return self._simulation
+
+    @property
+    def location(self) -> Point:  # location x, y in meters
+        return _StateView(self, 'positions')
+
+    @location.setter
+    def location(self, value: Point) -> None:
+        self._simulation.positions[self._index] = (value.x, value.y)
+        self._simulation.touch()
+
+    @property
+    def motion_vector(self) -> Vector:  # motion vector x,y in meters per second
+        return _StateView(self, 'velocities')
+
+    @motion_vector.setter
+    def motion_vector(self, value: Vector) -> None:
+        self._simulation.velocities[self._index] = (value.x, value.y)
+
+    @property
+    def mass(self) -> float:  # mass in kilograms
+        return float(self._simulation.masses[self._index])
+
+    @mass.setter
+    def mass(self, value: float) -> None:
+        self._simulation.masses[self._index] = value
+        self._simulation.touch()
+
+    @property
+    def test_particle(self) -> bool:  # feels gravity of the other bodies, but does not pull on them
+        return bool(self._simulation.test_particles[self._index])
+
+    @test_particle.setter
+    def test_particle(self, value: bool) -> None:
+        self._simulation.test_particles[self._index] = value
+        self._simulation.touch()
+
+    @property
+    def name(self) -> str:
+        return self._simulation.names[self._index]
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self._simulation.names[self._index] = value
+
+    def __str__(self):
+        return f"{self.name.ljust(20)}: Location {self.location}; Mass: {round(self.mass, 2)}; Motion vector: {self.motion_vector}"
+
+    __repr__ = __str__
+
+    def acceleration(self, bodies: List['Body'], step_size: int):
+        """
+            Kicks this body by the gravity of the other bodies. Kept for compatibility,
+            use Simulation.step to move all bodies at once.
+        """
+        sim = self._simulation
+        # the bodies may live in different simulations, like the ones of initial_states
+        massive = [body for body in bodies if not body.test_particle]
+        positions = np.array([body._simulation.positions[body._index] for body in massive], dtype=np.float64).reshape(-1, 2)
+        masses = np.array([body._simulation.masses[body._index] for body in massive], dtype=np.float64)
+        acceleration = pairwise_accelerations(sim.positions[self._index:self._index + 1],
+                                              positions,
+                                              masses,
+                                              sim.softening)
+        sim.velocities[self._index] += acceleration[0] * step_size
+
+    def update_pos(self, step_size: int):
+        sim = self._simulation
+        sim.positions[self._index] += sim.velocities[self._index] * step_size
+        sim.touch()
+
+
+class Simulation:
+    """
+        Structure of arrays holding the state of all bodies:
+        positions (n, 2) in meters, velocities (n, 2) in meters per second and masses (n,) in kilograms.
+        Test particles (n,) only feel the gravity of the other bodies, so N massive bodies and
+        M test particles cost O(N * (N + M)) instead of O((N + M)**2).
+    """
+
+    def __init__(self,
+                 bodies: Iterable[Body] = (),
+                 softening: float = 0.0,
+                 solver: str = "direct",
+                 theta: float = 0.5,
+                 integrator: str = "leapfrog",
+                 collision_radius: float = 0.0):
+        if solver not in SOLVERS:
+            raise ValueError(f"unknown solver {solver}, use one of {', '.join(SOLVERS)}")
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"unknown integrator {integrator}, use one of {', '.join(INTEGRATORS)}")
+        self.positions = np.zeros((0, 2), dtype=np.float64)
+        self.velocities = np.zeros((0, 2), dtype=np.float64)
+        self.masses = np.zeros(0, dtype=np.float64)
+        self.test_particles = np.zeros(0, dtype=bool)
+        self.names: List[str] = []
+        self.ids = np.zeros(0, dtype=np.int64)  # stable identity of every body, rows move when bodies are removed
+        self._next_id = 0
+        self.softening = softening  # meters, 0 means exact newtonian gravity
+        self.solver = solver
+        self.theta = theta  # opening angle of the barnes_hut solver
+        self.integrator = integrator
+        self.collision_radius = collision_radius  # meters, bodies closer than this merge, 0 turns merging off
+        self.merges: List[Tuple[str, List[str]]] = []  # (survivor, absorbed bodies) of every merge so far
+        self._accelerations: Optional[np.ndarray] = None  # valid for the current positions and masses
+
+        # block time steps: body steps are step_size / 2**level, level <= block_max_level
+        self.block_eta = 0.05
+        self.block_max_level = 10
+        # force evaluations of single bodies done so far, and how many a fixed step would need
+        self.force_evaluations = 0
+        self.fixed_step_evaluations = 0
+        self._views: List[Optional[Body]] = []
+        self.extend(bodies)
+
+    def __len__(self) -> int:
+        return len(self.masses)
+
+    def append_arrays(self,
+                      positions: np.ndarray,
+                      velocities: np.ndarray,
+                      masses: np.ndarray,
+                      names: Optional[List[str]] = None,
+                      test_particles: Optional[np.ndarray] = None) -> int:
+        """
+            Adds bodies straight from arrays, returns index of the first one.
+        """
+        start = len(self)
+        if names is None:
+            names = [str(i) for i in range(start, start + len(masses))]
+        if test_particles is None:
+            test_particles = np.zeros(len(masses), dtype=bool)
+        self.positions = np.concatenate((self.positions, np.asarray(positions, dtype=np.float64).reshape(-1, 2)))
+        self.velocities = np.concatenate((self.velocities, np.asarray(velocities, dtype=np.float64).reshape(-1, 2)))
+        self.masses = np.concatenate((self.masses, np.asarray(masses, dtype=np.float64).reshape(-1)))
+        self.test_particles = np.concatenate((self.test_particles, np.asarray(test_particles, dtype=bool).reshape(-1)))
+        self.names.extend(names)
+        self.ids = np.concatenate((self.ids, np.arange(self._next_id, self._next_id + len(names), dtype=np.int64)))
+        self._next_id += len(names)
+        self._views.extend([None] * len(names))
+        self.touch()
+        return start
+
+    def add(self, body: Body) -> Body:
+        self.extend([body])
+        return body
+
+    def extend(self, bodies: Iterable[Body]) -> None:
+        """
+            Moves the bodies into this simulation, the Body objects stay valid and become views of it.
+        """
+        bodies = [body for body in bodies if body._simulation is not self]
+        if not bodies:
+            return
+        positions = np.array([body._simulation.positions[body._index] for body in bodies])
+        velocities = np.array([body._simulation.velocities[body._index] for body in bodies])
+        masses = np.array([body._simulation.masses[body._index] for body in bodies])
+        names = [body.name for body in bodies]
+        test_particles = np.array([body.test_particle for body in bodies])
+
+        start = self.append_arrays(positions, velocities, masses, names, test_particles)
+        for i, body in enumerate(bodies, start):
+            old = body._simulation
+            old._views[body._index] = None
+            body._simulation = self
+            body._index = i
+            self._views[i] = body
+
+    def clear(self) -> None:
+        self.positions = np.zeros((0, 2), dtype=np.float64)
+        self.velocities = np.zeros((0, 2), dtype=np.float64)
+        self.masses = np.zeros(0, dtype=np.float64)
+        self.test_particles = np.zeros(0, dtype=bool)
+        self.names = []
+        self.ids = np.zeros(0, dtype=np.int64)
+        self._next_id = 0
+        self._views = []
+        self.touch()
+
+    def remove(self, indices: Iterable[int]) -> None:
+        """
+            Removes the bodies at indices. Their Body objects keep their last state in private simulations,
+            views of the remaining bodies follow them to their new rows.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.fromiter(indices, dtype=np.intp)] = False
+        for index in np.flatnonzero(~keep):
+            view = self._views[index]
+            if view is not None:
+                own = Simulation()
+                view._index = own.append_arrays(self.positions[index], self.velocities[index], self.masses[index:index + 1],
+                                                [self.names[index]], self.test_particles[index:index + 1])
+                view._simulation = own
+                own._views[0] = view
+
+        self.positions = self.positions[keep]
+        self.velocities = self.velocities[keep]
+        self.masses = self.masses[keep]
+        self.test_particles = self.test_particles[keep]
+        self.ids = self.ids[keep]
+        self.names = [name for name, kept in zip(self.names, keep) if kept]
+        self._views = [view for view, kept in zip(self._views, keep) if kept]
+        for index, view in enumerate(self._views):
+            if view is not None:
+                view._index = index
+        self.touch()
+
+    def merge_collisions(self) -> List[Tuple[str, List[str]]]:
+        """
+            Merges every group of bodies closer than collision_radius into its heaviest member,
+            keeping total mass, momentum and center of mass. Returns the merges, they are also added to merges.
+        """
+        if self.collision_radius <= 0 or len(self) < 2:
+            return []
+        first, second = SpatialHash(self.positions, self.collision_radius).pairs_within(self.collision_radius)
+        # test particles do not interact with each other
+        interacting = ~(self.test_particles[first] & self.test_particles[second])
+        first, second = first[interacting], second[interacting]
+        if len(first) == 0:
+            return []
+
+        # a body can touch several others in one step, so the pairs are joined into groups
+        parent: Dict[int, int] = {}
+
+        def root(i: int) -> int:
+            while parent.setdefault(i, i) != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in zip(first.tolist(), second.tolist()):
+            parent[root(i)] = root(j)
+        groups: Dict[int, List[int]] = {}
+        for i in list(parent):
+            groups.setdefault(root(i), []).append(i)
+
+        merges = []
+        removed = []
+        for members in groups.values():
+            members = np.array(members)
+            masses = self.masses[members]
+            survivor = members[np.argmax(masses)]
+            total = masses.sum()
+            if total > 0:
+                self.positions[survivor] = masses @ self.positions[members] / total
+                self.velocities[survivor] = masses @ self.velocities[members] / total
+            self.masses[survivor] = total
+            self.test_particles[survivor] = self.test_particles[members].all()
+            absorbed = members[members != survivor]
+            removed.extend(absorbed.tolist())
+            merges.append((self.names[survivor], [self.names[i] for i in absorbed]))
+
+        self.remove(removed)
+        self.merges.extend(merges)
+        return merges
+
+    def body(self, index: int) -> Body:
+        view = self._views[index]
+        if view is None:
+            view = Body.__new__(Body)
+            view._simulation = self
+            view._index = index
+            self._views[index] = view
+        return view
+
+    @property
+    def bodies(self) -> List[Body]:
+        return [self.body(i) for i in range(len(self))]
+
+    def touch(self) -> None:
+        """
+            Has to be called after positions or masses were changed outside of the integrators.
+        """
+        self._accelerations = None
+
+    def accelerations(self, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+            Accelerations of all bodies, either in their current positions or in the given ones.
+        """
+        if positions is None:
+            positions = self.positions
+        accelerations, _ = SOLVERS[self.solver]
+        self.force_evaluations += len(positions)
+        self.fixed_step_evaluations += len(positions)
+        sources = self.sources()
+        return accelerations(positions, positions[sources], self.masses[sources], self.softening, self.theta)
+
+    def accelerations_of(self, indices: np.ndarray) -> np.ndarray:
+        """
+            Accelerations of the selected bodies only, caused by all bodies.
+        """
+        accelerations, _ = SOLVERS[self.solver]
+        self.force_evaluations += len(indices)
+        self.fixed_step_evaluations += len(indices)
+        sources = self.sources()
+        return accelerations(self.positions[indices], self.positions[sources], self.masses[sources],
+                             self.softening, self.theta)
+
+    def sources(self) -> np.ndarray:
+        """
+            Indices of bodies that pull on the others, i.e. all but the test particles.
+        """
+        return np.flatnonzero(~self.test_particles)
+
+    def jerks(self) -> np.ndarray:
+        """
+            Time derivatives of the accelerations, exact for the direct solver
+            and from the same tree as the accelerations for barnes_hut.
+        """
+        sources = self.sources()
+        if self.solver == "barnes_hut":
+            return barnes_hut.barnes_hut_jerks(self.positions, self.velocities, self.positions[sources],
+                                               self.velocities[sources], self.masses[sources],
+                                               self.softening, self.theta)
+        return pairwise_jerks(self.positions, self.velocities, self.positions[sources], self.velocities[sources],
+                              self.masses[sources], self.softening)
+
+    @property
+    def force_evaluations_saved(self) -> int:
+        return self.fixed_step_evaluations - self.force_evaluations
+
+    def cached_accelerations(self) -> np.ndarray:
+        if self._accelerations is None:
+            self._accelerations = self.accelerations()
+        return self._accelerations
+
+    def force_error(self, sample_size: int = 100) -> Dict[str, float]:
+        """
+            Relative error of the barnes_hut solver against direct summation on a sample of bodies.
+        """
+        sources = self.sources()
+        return barnes_hut.force_error(self.positions, self.positions[sources], self.masses[sources],
+                                      self.theta, self.softening, sample_size)
+
+    def step(self, step_size: float) -> None:
+        """
+            Moves all bodies at once with the selected integrator, then merges the bodies that collided.
+        """
+        INTEGRATORS[self.integrator](self, step_size)
+        self.merge_collisions()
+
+    def advance(self, duration: float, step_size: float) -> int:
+        """
+            Simulates exactly `duration` seconds in steps of at most step_size, returns number of steps.
+        """
+        steps = 0
+        remaining = duration
+        while remaining > 0:
+            step = min(step_size, remaining)
+            self.step(step)
+            remaining -= step
+            steps += 1
+        return steps
+
+    def headings(self) -> np.ndarray:
+        """
+            Direction of movement of every body in degrees.
+        """
+        return np.degrees(np.arctan2(self.velocities[:, 1], self.velocities[:, 0]))
+
+    def kinetic_energy(self) -> float:
+        return float(0.5 * np.sum(self.masses * np.einsum('ij,ij->i', self.velocities, self.velocities)))
+
+    def potential_energy(self, theta: Optional[float] = None) -> float:
+        """
+            Exact sum over all pairs, or a barnes_hut approximation with the given opening angle.
+        """
+        sources = self.sources()
+        if theta is None:
+            potentials = pairwise_potentials(self.positions, self.positions[sources], self.masses[sources], self.softening)
+        else:
+            potentials = barnes_hut.barnes_hut_potentials(self.positions, self.positions[sources], self.masses[sources],
+                                                          self.softening, theta)
+        # pairs of two massive bodies are counted twice, test particles only once
+        weights = np.where(self.test_particles, 1.0, 0.5)
+        return float(np.sum(weights * self.masses * potentials))
+
+    def total_energy(self, theta: Optional[float] = None) -> float:
+        return self.kinetic_energy() + self.potential_energy(theta)
+
+    def momentum(self) -> np.ndarray:
+        return (self.masses[:, np.newaxis] * self.velocities).sum(axis=0)
+
+    def angular_momentum(self) -> float:
+        # z component of sum of m * (r x v), around the origin
+        cross = self.positions[:, 0] * self.velocities[:, 1] - self.positions[:, 1] * self.velocities[:, 0]
+        return float(np.sum(self.masses * cross))
+
+
+def simulation_of(bodies: List[Body]) -> Simulation:
+    """
+        Returns the simulation holding exactly these bodies, or a new one with their copies.
+    """
+    if bodies:
+        sim = bodies[0]._simulation
+        if len(sim) == len(bodies) and all(body._simulation is sim and body._index == i for i, body in enumerate(bodies)):
+            return sim
+
+    copy = Simulation()
+    copy.append_arrays(np.array([(body.location.x, body.location.y) for body in bodies]),
+                       np.array([(body.motion_vector.x, body.motion_vector.y) for body in bodies]),
+                       np.array([body.mass for body in bodies]),
+                       [body.name for body in bodies],
+                       np.array([body.test_particle for body in bodies], dtype=bool))
+    return copy
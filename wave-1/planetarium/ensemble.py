@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# runs many n_nary_stable_system simulations with different parameters on all cores
+# python3 ensemble.py --stars 3 4 5 6 --masses 1e24 1e26 --velocity-scales 0.5 1 2 -o stability.csv
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from engine import Simulation
+from initial_states import n_nary_stable_system
+from integrators import INTEGRATORS
+
+SUMMARY_FIELDS = ("stars", "mass", "velocity_scale", "status", "steps", "sim_time",
+                  "energy_drift", "max_radius_ratio", "wall_time")
+
+
+def parameter_grid(stars: List[int], masses: List[float], velocity_scales: List[float]) -> Iterator[Dict]:
+    for n_stars, mass, velocity_scale in itertools.product(stars, masses, velocity_scales):
+        yield {"stars": n_stars, "mass": mass, "velocity_scale": velocity_scale}
+
+
+def run_member(parameters: Dict, steps: int, step_size: float, integrator: str,
+               check_every: int, max_drift: float, escape_factor: float) -> Dict:
+    """
+        One simulation of the ensemble. Stops early when the energy drifts more than max_drift
+        or a body gets escape_factor times farther from the center of mass than the farthest one started.
+    """
+    start = time.perf_counter()
+    simulation = Simulation(n_nary_stable_system(parameters["stars"]), integrator=integrator)
+    simulation.masses[:] = parameters["mass"]
+    simulation.velocities *= parameters["velocity_scale"]
+    simulation.touch()
+
+    def radii():
+        center = np.average(simulation.positions, axis=0, weights=simulation.masses)
+        return np.linalg.norm(simulation.positions - center, axis=1)
+
+    initial_energy = simulation.total_energy()
+    initial_radius = radii().max()
+    status = "stable"
+    drift = 0.0
+    radius_ratio = 1.0
+    done = 0
+    while done < steps:
+        for _ in range(min(check_every, steps - done)):
+            simulation.step(step_size)
+            done += 1
+
+        drift = abs((simulation.total_energy() - initial_energy) / initial_energy)
+        radius_ratio = radii().max() / initial_radius
+        if not np.isfinite(drift) or drift > max_drift:
+            status = "energy drift"
+            break
+        if radius_ratio > escape_factor:
+            status = "escape"
+            break
+
+    return dict(parameters,
+                status=status,
+                steps=done,
+                sim_time=done * step_size,
+                energy_drift=drift,
+                max_radius_ratio=radius_ratio,
+                wall_time=time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stability sweep of n_nary_stable_system")
+    parser.add_argument("--stars", type=int, nargs="+", default=[3, 4, 5, 6])
+    parser.add_argument("--masses", type=float, nargs="+", default=[10**24])
+    parser.add_argument("--velocity-scales", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--steps", type=int, default=10**4)
+    parser.add_argument("--step-size", type=float, default=10**5)
+    parser.add_argument("--integrator", default="leapfrog", choices=list(INTEGRATORS))
+    parser.add_argument("--check-every", type=int, default=100, help="steps between the early stop checks")
+    parser.add_argument("--max-drift", type=float, default=10**-3)
+    parser.add_argument("--escape-factor", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-o", "--output", type=Path, default=Path("ensemble.csv"))
+    args = parser.parse_args()
+
+    grid = list(parameter_grid(args.stars, args.masses, args.velocity_scales))
+    start = time.perf_counter()
+    with open(args.output, "w", newline="") as f, ProcessPoolExecutor(args.workers) as pool:
+        writer = csv.DictWriter(f, SUMMARY_FIELDS)
+        writer.writeheader()
+        futures = [pool.submit(run_member, parameters, args.steps, args.step_size, args.integrator,
+                               args.check_every, args.max_drift, args.escape_factor) for parameters in grid]
+        # rows are written as the runs finish, so a long sweep can be watched
+        for future in as_completed(futures):
+            writer.writerow(future.result())
+            f.flush()
+
+    print(f"{len(grid)} runs on {args.workers} workers in {time.perf_counter() - start:.2f} s, summary in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+
+from constants import GRAVITATION_CONSTANT
+
+# how many (target, source) pairs are evaluated at once, keeps the temporary
+# (chunk, n, 2) arrays at a few megabytes even for thousands of bodies
+PAIRS_PER_CHUNK = 2**18
+
+
+def _chunks(n_targets: int, n_sources: int):
+    rows = max(1, PAIRS_PER_CHUNK // max(1, n_sources))
+    for start in range(0, n_targets, rows):
+        yield start, min(start + rows, n_targets)
+
+
+def pairwise_accelerations(targets: np.ndarray,
+                           sources: np.ndarray,
+                           masses: np.ndarray,
+                           softening: float = 0.0) -> np.ndarray:
+    """
+        Acceleration of every target caused by all of the sources, in one batched pass.
+        Pairs with zero distance (a body and itself) are skipped.
+    """
+    accelerations = np.zeros((len(targets), 2))
+    if len(sources) == 0:
+        return accelerations
+
+    for start, end in _chunks(len(targets), len(sources)):
+        diff = sources[np.newaxis, :, :] - targets[start:end, np.newaxis, :]  # diff[i, j] = source j - target i
+        r2 = np.einsum('ijk,ijk->ij', diff, diff)
+        r2[r2 == 0] = np.inf
+        r2 += softening**2
+        inv_r3 = r2 ** -1.5
+        accelerations[start:end] = np.einsum('ij,ijk->ik', inv_r3 * masses, diff)
+
+    accelerations *= GRAVITATION_CONSTANT
+    return accelerations
+
+
+def pairwise_potentials(targets: np.ndarray,
+                        sources: np.ndarray,
+                        masses: np.ndarray,
+                        softening: float = 0.0) -> np.ndarray:
+    """
+        Gravitational potential (per kilogram, negative) at every target.
+    """
+    potentials = np.zeros(len(targets))
+    if len(sources) == 0:
+        return potentials
+
+    for start, end in _chunks(len(targets), len(sources)):
+        diff = sources[np.newaxis, :, :] - targets[start:end, np.newaxis, :]
+        r2 = np.einsum('ijk,ijk->ij', diff, diff)
+        r2[r2 == 0] = np.inf
+        r2 += softening**2
+        potentials[start:end] = (masses / np.sqrt(r2)).sum(axis=1)
+
+    potentials *= -GRAVITATION_CONSTANT
+    return potentials
+
+
+def pairwise_jerks(targets: np.ndarray,
+                   target_velocities: np.ndarray,
+                   sources: np.ndarray,
+                   source_velocities: np.ndarray,
+                   masses: np.ndarray,
+                   softening: float = 0.0) -> np.ndarray:
+    """
+        Time derivative of the acceleration of every target (jerk), used to pick time steps.
+    """
+    jerks = np.zeros((len(targets), 2))
+    if len(sources) == 0:
+        return jerks
+
+    for start, end in _chunks(len(targets), len(sources)):
+        diff = sources[np.newaxis, :, :] - targets[start:end, np.newaxis, :]
+        velocity_diff = source_velocities[np.newaxis, :, :] - target_velocities[start:end, np.newaxis, :]
+        r2 = np.einsum('ijk,ijk->ij', diff, diff)
+        r2[r2 == 0] = np.inf
+        r2 += softening**2
+        inv_r3 = r2 ** -1.5
+        rv = np.einsum('ijk,ijk->ij', diff, velocity_diff) / r2
+        weight = (inv_r3 * masses)[:, :, np.newaxis]
+        jerks[start:end] = np.sum(weight * (velocity_diff - 3 * rv[:, :, np.newaxis] * diff), axis=1)
+
+    jerks *= GRAVITATION_CONSTANT
+    return jerks
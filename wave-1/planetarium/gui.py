@@ -1,26 +1,46 @@
 #!/usr/bin/env python3
 
+import argparse
+import time
 import tkinter
-import turtle
-import math
-import random
+from pathlib import Path
 
-from gravity import Body, calculate_system_energy
-from initial_states import solar_bodies, n_nary_stable_system
+import numpy as np
+
+from checkpoint import read_checkpoint, save_checkpoint
+from gravity import Body, Simulation, calculate_system_energy
+from headless import load_trajectory
+from initial_states import solar_bodies, n_nary_stable_system, asteroid_belt
 from point import Point, Vector
+from renderer import TrailRenderer
+from spatial_hash import SpatialHash
+from telemetry import Telemetry
+from worker import SimulationWorker
 
 SCALE = 10**9
-HEX_CHARS = "0123456789ABCDEF"
+TARGET_FPS = 60
+YEAR = 365 * 24 * 60 * 60
+CHECKPOINT_PATH = Path("planetarium_checkpoint.npz")
+CLICK_RADIUS = 5  # pixels around a body that select it
 
 options = {
-    "calc_per_draw": 1,
+    "time_per_draw": 10 ** 5,
     "run": True,
     "step_size": 10 ** 5,
+    "integrator": "block",
+    "collision_radius": SCALE,  # bodies closer than one pixel merge
+    "telemetry_interval": 100,
     "steps": 0,
-    "sim_time": 0
+    "sim_time": 0,
+    "generation": 0,
+    "steps_per_sec": 0,
+    "frame_time": 0,
+    "rate_time": 0,
+    "rate_steps": 0
 }
-turtles = []
-bodies = []
+simulation = Simulation(integrator=options['integrator'], collision_radius=options['collision_radius'])
+telemetry = Telemetry(simulation, options['telemetry_interval'])
+worker = SimulationWorker(simulation, options['step_size'], telemetry)
 
 
 def convert_time(total_seconds: int):
@@ -35,42 +55,131 @@ def convert_time(total_seconds: int):
     return f"{years} years, {days} days, {t_h} hours, {t_min} minutes, {t_sec}, seconds"
 
 
+def settings_text():
+    return f"max step size: {convert_time(options['step_size'])} | simulated time per draw: {convert_time(options['time_per_draw'])}"
+
+
+def stats_text():
+    text = f"step number: {options['steps']} | time elapsed: {convert_time(options['sim_time'])}"
+    text += f" | steps/s: {options['steps_per_sec']} | frame time: {options['frame_time']:.1f} ms"
+    if options['integrator'] == "block":
+        text += f" | force evaluations saved: {simulation.force_evaluations_saved}"
+    if worker.fast_forwarding:
+        text += " | fast forwarding..."
+    sample = telemetry.latest()
+    if sample is not None:
+        text += f"\nenergy drift: {sample['energy_drift']:.2e} | momentum: ({sample['momentum_x']:.3e}, {sample['momentum_y']:.3e})"
+        text += f" | angular momentum: {sample['angular_momentum']:.4e}"
+    return text
+
+
 def toggle_run():
     options['run'] = not options['run']
+    if not options['run']:
+        worker.pause()
 
 
 def full_delete(event):
     if check_toplevels():
         return
 
-    turtles.clear()
-    bodies.clear()
-    turtle_screen.clear()
+    renderer.clear()
+
+    # snapshots published before the reset belong to the old generation and are not drawn
+    options['generation'] += 1
+    worker.pause()
+    worker.submit(lambda generation=options['generation']: worker.reset(generation))
 
     options['steps'] = 0
     options['sim_time'] = 0
     options['run'] = False
-    label_stats['text'] = f"step number: {options['steps']} | time elapsed: {options['sim_time']}"
+    label_stats['text'] = stats_text()
+
+
+def save_state(event):
+    if check_toplevels():
+        return
+
+    def save():
+        save_checkpoint(CHECKPOINT_PATH, simulation, worker.steps, worker.sim_time, worker.step_size)
+        print(f"checkpoint written to {CHECKPOINT_PATH}")
+    worker.submit(save)
+
+
+def load_state(event):
+    if check_toplevels():
+        return
+    if not CHECKPOINT_PATH.exists():
+        print(f"no checkpoint in {CHECKPOINT_PATH}")
+        return
+
+    data = read_checkpoint(CHECKPOINT_PATH)
+    renderer.clear()
+    options['generation'] += 1
+    worker.submit(lambda generation=options['generation']: worker.restore(data, generation))
+
+    options['step_size'] = int(data['step_size'])
+    options['integrator'] = str(data['integrator'])
+    label_settings['text'] = settings_text()
+
+
+def jump(n_window, entry):
+    try:
+        years = float(entry.get())
+    except ValueError:
+        print("check your values")
+        return
+    n_window.destroy()
+
+    # nothing is drawn until the worker gets there
+    renderer.clear_trails()
+    options['generation'] += 1
+    worker.submit(lambda generation=options['generation']: worker.fast_forward(years * YEAR, generation))
+
+
+def jump_prompt(event):
+    if check_toplevels():
+        return
+
+    n_window = tkinter.Toplevel(window)
+    n_window.title("Jump to time")
+
+    l_time = tkinter.Label(n_window, text="Time in years")
+    l_time.pack()
+    e_time = tkinter.Entry(n_window)
+    e_time.insert(0, str(options['sim_time'] / YEAR))
+    e_time.pack()
+    btn_submit = tkinter.Button(n_window, text="ok", command=lambda: jump(n_window, e_time))
+    btn_submit.pack()
+
+
+def export_telemetry(event):
+    if check_toplevels():
+        return
+
+    path = Path(f"telemetry_{int(time.time())}.csv")
+    def export():
+        telemetry.to_csv(path)
+        print(f"telemetry written to {path}")
+    worker.submit(export)
 
 
 def calc_up(event):
     if check_toplevels():
         return
 
-    options['calc_per_draw'] *= 2
-    settings = f"step size: {convert_time(options['step_size'])} | steps per draw: {options['calc_per_draw']}"
-    label_settings['text'] = settings
+    options['time_per_draw'] *= 2
+    label_settings['text'] = settings_text()
 
 
 def calc_down(event):
     if check_toplevels():
         return
-    if options['calc_per_draw'] <= 1:
+    if options['time_per_draw'] <= 1:
         return
 
-    options['calc_per_draw'] = options['calc_per_draw'] // 2
-    settings = f"step size: {convert_time(options['step_size'])} | steps per draw: {options['calc_per_draw']}"
-    label_settings['text'] = settings
+    options['time_per_draw'] = options['time_per_draw'] // 2
+    label_settings['text'] = settings_text()
 
 
 def speed_up(event):
@@ -78,8 +187,8 @@ def speed_up(event):
         return
 
     options['step_size'] += int(options['step_size'] / 100 * 12)
-    settings = f"step size: {convert_time(options['step_size'])} | steps per draw: {options['calc_per_draw']}"
-    label_settings['text'] = settings
+    worker.step_size = options['step_size']
+    label_settings['text'] = settings_text()
 
 
 def speed_down(event):
@@ -87,8 +196,8 @@ def speed_down(event):
         return
 
     options['step_size'] -= int(options['step_size'] / 100 * 10)
-    settings = f"step size: {convert_time(options['step_size'])} | steps per draw: {options['calc_per_draw']}"
-    label_settings['text'] = settings
+    worker.step_size = options['step_size']
+    label_settings['text'] = settings_text()
 
 
 def check_toplevels():
@@ -98,23 +207,14 @@ def check_toplevels():
     return False
 
 
-def rand_color():
-    s = "#"
-    for _ in range(6):
-        s += random.choice(HEX_CHARS)
-    return s
-
-
-def reset_turtles(turtle_screen, turtles):
+def reset_trails(event):
     if check_toplevels():
         return
 
-    for t in turtles:
-        t.clear()
-    turtle_screen.update()
+    renderer.clear_trails()
 
 
-def edit_body(n_window, entries, body_to_edit):
+def edit_body(n_window, entries, body_id):
     name, posx, posy, mass, vecx, vecy = map(lambda x: x.get(), entries)
     try:
         posx, posy, mass, vecx, vecy = map(float, (posx, posy, mass, vecx, vecy))
@@ -123,21 +223,24 @@ def edit_body(n_window, entries, body_to_edit):
         return
     n_window.destroy()
 
-    if body_to_edit is None:
-        t = turtle.RawTurtle(turtle_screen)
-        t.penup()
-        t.goto(posx/SCALE, posy/SCALE)
-        t.pendown()
-        t.color(rand_color())
-        turtles.append(t)
-        bodies.append(Body(Point(posx, posy), mass, Vector(vecx, vecy), name))
+    # the simulation belongs to the worker thread, so changes are sent to it
+    if body_id is None:
+        worker.submit(lambda: simulation.add(Body(Point(posx, posy), mass, Vector(vecx, vecy), name)))
+        worker.submit(telemetry.rebase)
     else:
-        body_to_edit.name = name
-        body_to_edit.location.x = posx
-        body_to_edit.location.y = posy
-        body_to_edit.mass = mass
-        body_to_edit.motion_vector.x = vecx
-        body_to_edit.motion_vector.y = vecy
+        def edit():
+            # looked up by id on the worker thread, rows move when bodies merge
+            rows = np.flatnonzero(simulation.ids == body_id)
+            if not len(rows):
+                print("the body does not exist anymore, it has merged")
+                return
+            body = simulation.body(int(rows[0]))
+            body.name = name
+            body.location = Point(posx, posy)
+            body.mass = mass
+            body.motion_vector = Vector(vecx, vecy)
+        worker.submit(edit)
+        worker.submit(telemetry.rebase)
 
 
 def body_prompt(x, y):
@@ -171,20 +274,22 @@ def body_prompt(x, y):
     e_vecy.pack()
 
     # if body was clicked, load data from it
-    body_to_edit = None
-    for body in bodies:
-        if body.location.x / SCALE + 395 < x < body.location.x / SCALE + 405:
-            if body.location.y / SCALE * -1 + 395 < y < body.location.y / SCALE * -1 + 405:
-                body_to_edit = body
-                e_name.insert(0, str(body.name))
-                e_posx.insert(0, str(body.location.x))
-                e_posy.insert(0, str(body.location.y))
-                e_mass.insert(0, str(body.mass))
-                e_vecx.insert(0, str(body.motion_vector.x))
-                e_vecy.insert(0, str(body.motion_vector.y))
-                break
-
-    if body_to_edit is None:
+    # the simulation belongs to the worker thread, only its snapshot is read here
+    body_id = None  # id of the clicked body
+    snapshot = worker.latest()
+    clicked = np.array([(x - 400) * SCALE, (y - 400) * -1 * SCALE])
+    radius = CLICK_RADIUS * SCALE
+    index = SpatialHash(snapshot.positions, radius).nearest(clicked, radius)
+    if index is not None:
+        body_id = int(snapshot.ids[index])
+        e_name.insert(0, str(snapshot.names[index]))
+        e_posx.insert(0, str(snapshot.positions[index, 0]))
+        e_posy.insert(0, str(snapshot.positions[index, 1]))
+        e_mass.insert(0, str(snapshot.masses[index]))
+        e_vecx.insert(0, str(snapshot.velocities[index, 0]))
+        e_vecy.insert(0, str(snapshot.velocities[index, 1]))
+
+    if body_id is None:
         e_posx.insert(0, str((x - 400) * SCALE))
         e_posy.insert(0, str((y - 400) * -1 * SCALE))
 
@@ -192,77 +297,111 @@ def body_prompt(x, y):
     btn_submit = tkinter.Button(n_window,
                                 text="ok",
                                 command=lambda:
-                                edit_body(n_window, entries, body_to_edit))
+                                edit_body(n_window, entries, body_id))
     btn_submit.pack()
 
 
 def tick():
+    frame_start = time.perf_counter()
+    if options['run']:
+        worker.grant(options['time_per_draw'])
+
+    snapshot = worker.latest()
+    if snapshot.generation == options['generation']:
+        renderer.update(snapshot.positions, snapshot.ids)
+
+        # steps per second, averaged over roughly half a second
+        elapsed = frame_start - options['rate_time']
+        if elapsed >= 0.5:
+            options['steps_per_sec'] = max(0, int((snapshot.steps - options['rate_steps']) / elapsed))
+            options['rate_time'] = frame_start
+            options['rate_steps'] = snapshot.steps
+        options['steps'] = snapshot.steps
+        options['sim_time'] = int(snapshot.sim_time)
+
+    label_stats['text'] = stats_text()
+
+    options['frame_time'] = (time.perf_counter() - frame_start) * 1000
+    window.after(max(1, int(1000 / TARGET_FPS - options['frame_time'])), tick)
+
+
+def replay_tick(frames, frame_time):
+    window.after(int(1000 / TARGET_FPS), replay_tick, frames, frame_time)
     if not options['run']:
         return
-    # for body in bodies:
-    #     print(body)
-    for i in range(options['calc_per_draw']):
-        for i in range(len(bodies)):
-            body = bodies[i]
-            t = turtles[i]
-            body.acceleration(bodies, options['step_size'])
-            body.update_pos(options['step_size'])
-            t.right(t.heading() - math.degrees(math.atan2(body.motion_vector.y, body.motion_vector.x)))
-        options['steps'] += 1
-        options['sim_time'] += options['step_size']
-
-    for i in range(len(bodies)):
-        body = bodies[i]
-        t = turtles[i]
-        t.goto(body.location.x/SCALE, body.location.y/SCALE)
-
-    label_stats['text'] = f"step number: {options['steps']} | time elapsed: {convert_time(options['sim_time'])}"
-    turtle_screen.update()
+
+    # skip as many recorded frames as the simulated time per draw covers
+    frame = options['frame'] + max(1, int(options['time_per_draw'] // frame_time))
+    if frame >= len(frames):
+        frame = len(frames) - 1
+        options['run'] = False
+    options['frame'] = frame
+    options['steps'] = frame * options['every']
+    options['sim_time'] = int(frame * frame_time)
+
+    renderer.update(frames[frame])
+    label_stats['text'] = stats_text()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="planetarium")
+    parser.add_argument("--replay", type=Path, help="play back a trajectory written by headless.py")
+    args = parser.parse_args()
+
     # build main window
     window = tkinter.Tk()
-    # bodies = n_nary_stable_system(3, scale=SCALE, screen_size=(800, 800))
-    bodies = solar_bodies(only_first_n_planets=4)
+    if args.replay:
+        frames, metadata = load_trajectory(args.replay)
+        frame_time = metadata['frame_time']
+        options['frame'] = 0
+        options['every'] = metadata['every']
+        options['step_size'] = int(metadata['step_size'])
+        options['time_per_draw'] = max(1, int(frame_time))
+        bodies = [Body(Point(x, y), 0, Vector(0, 0), name) for (x, y), name in zip(frames[0], metadata['names'])]
+    else:
+        # bodies = n_nary_stable_system(3, scale=SCALE, screen_size=(800, 800))
+        # bodies = asteroid_belt(2000)
+        bodies = solar_bodies(only_first_n_planets=4)
+    simulation = Simulation(bodies, integrator=options['integrator'], collision_radius=options['collision_radius'])
+    telemetry = Telemetry(simulation, options['telemetry_interval'])
+    worker = SimulationWorker(simulation, options['step_size'], telemetry)
 
     can = tkinter.Canvas(window, width=800, height=800)
     can.pack()
-    turtle_screen = turtle.TurtleScreen(can)
-    turtle_screen.tracer(0,0)
-    stats = f"step number: {options['steps']} | time elapsed: {options['sim_time']}"
-    label_stats = tkinter.Label(window, text=stats)
+    renderer = TrailRenderer(can, SCALE)
+    label_stats = tkinter.Label(window, text=stats_text())
     label_stats.pack()
-    settings = f"step size: {convert_time(options['step_size'])} | steps per draw: {options['calc_per_draw']}"
-    label_settings = tkinter.Label(window, text=settings)
+    label_settings = tkinter.Label(window, text=settings_text())
     label_settings.pack()
-    t_mouse = "click on canvas to create new body, or click existing one (tip of turtle) to edit it"
+    t_mouse = "click on canvas to create new body, or click existing one (its dot) to edit it"
     label_mouse = tkinter.Label(window, text=t_mouse)
     label_mouse.pack()
-    t_keybinds = "SPACE: play/pause | R: reset trails | C: remove bodies and lines | Q/E: step size up/down | A/D: calculations per update"
+    t_keybinds = "SPACE: play/pause | R: reset trails | C: remove bodies and lines | Q/E: step size up/down | A/D: simulated time per update | X: export telemetry | S/L: save/load checkpoint | J: jump to time"
     label_keybinds = tkinter.Label(window, text=t_keybinds)
     label_keybinds.pack()
 
-    turtles = []
-    for i in bodies:
-        t = turtle.RawTurtle(turtle_screen)
-        t.penup()
-        t.goto(i.location.x/SCALE, i.location.y/SCALE)
-        t.pendown()
-        t.color(rand_color())
-        turtles.append(t)
-
     # bindings for keyboard and mouse
-    can.bind("<Button-1>", lambda event: body_prompt(event.x, event.y))
-    can.bind_all("r", lambda x: reset_turtles(turtle_screen, turtles))
+    can.bind_all("r", reset_trails)
     can.bind_all("<space>", lambda x: toggle_run())
     can.bind_all("e", speed_up)
     can.bind_all("q", speed_down)
-    can.bind_all("c", full_delete)
     can.bind_all("d", calc_up)
     can.bind_all("a", calc_down)
-
-    while True:
+    # the worker does not run during a replay, so nothing could execute these
+    if not args.replay:
+        can.bind("<Button-1>", lambda event: body_prompt(event.x, event.y))
+        can.bind_all("c", full_delete)
+        can.bind_all("x", export_telemetry)
+        can.bind_all("s", save_state)
+        can.bind_all("l", load_state)
+        can.bind_all("j", jump_prompt)
+
+    snapshot = worker.latest()
+    renderer.update(snapshot.positions, snapshot.ids)
+    if args.replay:
+        replay_tick(frames, frame_time)
+    else:
+        worker.start()
         tick()
-        window.after(1)
-        window.update()
+    window.mainloop()
+    worker.stop()
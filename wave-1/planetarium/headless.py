@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# runs the simulation without any window and streams positions into a .npy file
+# python3 headless.py --planets 4 --steps 1000000 --every 100 -o solar.npy
+# the file can be replayed with: python3 gui.py --replay solar.npy
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from catalog import load_catalog
+from checkpoint import load_checkpoint, save_checkpoint
+from engine import SOLVERS, Simulation
+from initial_states import asteroid_belt, n_nary_stable_system, solar_bodies
+from integrators import INTEGRATORS
+
+SCALE = 10**9
+
+
+def metadata_path(path: Path) -> Path:
+    # trajectory.npy -> trajectory.npy.json, never the name of a catalog like planets.json
+    path = Path(path)
+    return path.with_name(path.name + ".json")
+
+
+def simulate(simulation: Simulation, steps: int, step_size: float, every: int, path: Path) -> np.memmap:
+    """
+        Simulates `steps` steps and writes positions after every `every` steps (and the initial ones).
+        The output is preallocated on disk, so memory does not grow with the number of steps.
+        Rows of bodies merged into others are NaN from then on.
+    """
+    frames = steps // every + 1
+    trajectory = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(frames, len(simulation), 2))
+    with open(metadata_path(path), "w") as f:
+        json.dump({
+            "names": simulation.names,
+            "step_size": step_size,
+            "every": every,
+            "frame_time": step_size * every,
+            "integrator": simulation.integrator,
+            "solver": simulation.solver,
+        }, f, indent=2)
+
+    initial_ids = simulation.ids.copy()
+    trajectory[0] = simulation.positions
+    for frame in range(1, frames):
+        for _ in range(every):
+            simulation.step(step_size)
+        if len(simulation) == len(initial_ids):
+            trajectory[frame] = simulation.positions
+        else:
+            trajectory[frame] = np.nan
+            trajectory[frame, np.searchsorted(initial_ids, simulation.ids)] = simulation.positions
+    trajectory.flush()
+    return trajectory
+
+
+def load_trajectory(path: Path) -> Tuple[np.ndarray, Dict]:
+    """
+        Opens a trajectory written by simulate without reading it into memory.
+    """
+    frames = np.load(path, mmap_mode="r")
+    with open(metadata_path(path)) as f:
+        metadata = json.load(f)
+    return frames, metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless planetarium simulation")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--planets", type=int, default=4, help="sun and the first N planets from planets.json")
+    source.add_argument("--stars", type=int, help="n_nary_stable_system with N stars")
+    source.add_argument("--belt", type=int, help="sun up to Jupiter and N asteroid belt test particles")
+    parser.add_argument("--catalog", type=Path, help="add minor bodies of a .jsonl or .csv catalog as test particles")
+    parser.add_argument("--steps", type=int, default=10**4, help="rounded down to a multiple of --every")
+    parser.add_argument("--every", type=int, default=10, help="write positions after every k steps")
+    # without a value given, a new simulation uses the defaults and a resumed one keeps its own
+    parser.add_argument("--step-size", type=float, help="seconds, default 1e5")
+    parser.add_argument("--integrator", choices=list(INTEGRATORS), help="default leapfrog")
+    parser.add_argument("--solver", choices=list(SOLVERS), help="default direct")
+    parser.add_argument("--theta", type=float, help="default 0.5")
+    parser.add_argument("--collision-radius", type=float, help="meters, closer bodies merge, default 0")
+    parser.add_argument("-o", "--output", type=Path, default=Path("trajectory.npy"))
+    source.add_argument("--resume", type=Path, help="start from a checkpoint instead of the initial state")
+    parser.add_argument("--checkpoint", type=Path, help="write a checkpoint of the final state")
+    args = parser.parse_args()
+    if args.resume is not None and args.catalog is not None:
+        parser.error("argument --catalog: not allowed with argument --resume")
+
+    state = {"steps": 0, "sim_time": 0.0, "step_size": 10**5}
+    if args.resume is not None:
+        simulation, state = load_checkpoint(args.resume)
+    else:
+        if args.stars is not None:
+            bodies = n_nary_stable_system(args.stars, scale=SCALE, screen_size=(800, 800))
+        elif args.belt is not None:
+            bodies = asteroid_belt(args.belt)
+        else:
+            bodies = solar_bodies(only_first_n_planets=args.planets)
+        simulation = Simulation(bodies)
+        if args.catalog is not None:
+            load_catalog(simulation, args.catalog, test_particles=True)
+    for option in ("integrator", "solver", "theta", "collision_radius"):
+        if getattr(args, option) is not None:
+            setattr(simulation, option, getattr(args, option))
+            # accelerations restored from a checkpoint may come from another solver
+            simulation.touch()
+    step_size = args.step_size if args.step_size is not None else state["step_size"]
+
+    initial_energy = simulation.total_energy()
+    start = time.perf_counter()
+    trajectory = simulate(simulation, args.steps, step_size, args.every, args.output)
+    elapsed = time.perf_counter() - start
+    steps = (len(trajectory) - 1) * args.every
+
+    drift = (simulation.total_energy() - initial_energy) / abs(initial_energy) if initial_energy else 0.0
+    print(f"{len(simulation)} bodies, {steps} steps in {elapsed:.2f} s ({steps / elapsed:.0f} steps/s)")
+    print(f"relative energy drift: {drift:.3e}")
+    for survivor, absorbed in simulation.merges:
+        print(f"{', '.join(absorbed)} merged into {survivor}")
+    if simulation.solver == "barnes_hut":
+        print(f"force error against direct sum: {simulation.force_error()}")
+    print(f"trajectory written to {args.output}")
+
+    if args.checkpoint is not None:
+        save_checkpoint(args.checkpoint, simulation, state["steps"] + steps,
+                        state["sim_time"] + steps * step_size, step_size)
+        print(f"checkpoint written to {args.checkpoint}")
+
+
+if __name__ == '__main__':
+    main()
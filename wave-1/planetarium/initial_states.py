@@ -1,38 +1,44 @@
 import math
 from typing import Tuple, List
-import json
+import random
 import string
 
 from point import Point, Vector
-from gravity import Body
+from gravity import GRAVITATION_CONSTANT, Body
+from catalog import read_catalog
 
 
 def solar_bodies(only_first_n_planets: int = 4) -> List[Body]:
     # https://devstronomy.com/#/datasets
-    with open('planets.json') as f:
-        content = json.load(f)
+    # for big catalogs use catalog.load_catalog, it fills a Simulation without any Body objects
+    content = read_catalog('planets.json', id_range=(1, only_first_n_planets), cache=False)
 
     bodies = [Body(Point(0, 0), 1.989 * (10**30), Vector(0, 0), "Sun")]
 
     for x in content:
-        if int(x["id"]) > only_first_n_planets:
-            continue
-
-        distance_from_sun = x["distanceFromSun"] * 10**9  # meters
-        mass = x["mass"] * 10**24  # kg
-        orbital_velocity = x["orbitalVelocity"] * 10**3  # meters per second
+        distance_from_sun = float(x["distanceFromSun"]) * 10**9  # meters
+        mass = float(x["mass"]) * 10**24  # kg
+        orbital_velocity = float(x["orbitalVelocity"]) * 10**3  # meters per second
 
         bodies.append(
             Body(
                 Point(distance_from_sun, 0),
                 mass,
                 Vector(0, orbital_velocity),
-                x["name"]
+                str(x["name"])
             )
         )
     return bodies
 
 
+def star_name(i: int) -> str:
+    # A .. Z, then A1 .. Z1 and so on for systems with more than 26 stars
+    letter = string.ascii_uppercase[i % len(string.ascii_uppercase)]
+    if i < len(string.ascii_uppercase):
+        return letter
+    return letter + str(i // len(string.ascii_uppercase))
+
+
 def n_nary_stable_system(n_stars: int = 3, scale=10**9, screen_size: Tuple[int, int] = (400, 300)) -> List[Body]:
     screensize_max = max(screen_size)
 
@@ -51,7 +57,34 @@ def n_nary_stable_system(n_stars: int = 3, scale=10**9, screen_size: Tuple[int,
                 Point(x_circle_1 * circle_radius, y_circle_1 * circle_radius),
                 10**24,
                 Vector(y_circle_1 * n_stars * 2, -x_circle_1 * n_stars * 2),
-                string.ascii_uppercase[i]
+                star_name(i)
+            )
+        )
+    return bodies
+
+
+def asteroid_belt(n_particles: int = 2000, only_first_n_planets: int = 5, seed: int = 0) -> List[Body]:
+    """
+        Solar system with massless test particles on circular orbits between Mars and Jupiter.
+    """
+    content = read_catalog('planets.json', cache=False)
+    distances = {str(x["name"]): float(x["distanceFromSun"]) * 10**9 for x in content}  # meters
+
+    bodies = solar_bodies(only_first_n_planets)
+    sun = bodies[0]
+    rng = random.Random(seed)
+    for i in range(n_particles):
+        distance = rng.uniform(distances["Mars"], distances["Jupiter"])
+        angle = rng.uniform(0, 2 * math.pi)
+        velocity = math.sqrt(GRAVITATION_CONSTANT * sun.mass / distance)  # circular orbit around the sun
+
+        bodies.append(
+            Body(
+                Point(math.cos(angle) * distance, math.sin(angle) * distance),
+                0,
+                Vector(-math.sin(angle) * velocity, math.cos(angle) * velocity),
+                f"asteroid {i}",
+                test_particle=True
             )
         )
     return bodies
@@ -0,0 +1,116 @@
+"""
+    Time integrators, every one of them is called as integrator(simulation, step_size)
+    and moves all bodies synchronously - no body sees a half updated state of another one.
+"""
+
+import numpy as np
+
+# coefficients of the 4th order Yoshida integrator
+_CBRT2 = 2 ** (1 / 3)
+_W1 = 1 / (2 - _CBRT2)
+_W0 = -_CBRT2 / (2 - _CBRT2)
+YOSHIDA_DRIFTS = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+YOSHIDA_KICKS = (_W1, _W0, _W1)
+
+
+def semi_implicit_euler(simulation, step_size: float) -> None:
+    simulation.velocities += simulation.accelerations() * step_size
+    simulation.positions += simulation.velocities * step_size
+    simulation.touch()
+
+
+def leapfrog(simulation, step_size: float) -> None:
+    """
+        Kick-drift-kick velocity Verlet. The acceleration at the end of the step is cached,
+        so it costs one force evaluation per step.
+    """
+    simulation.velocities += simulation.cached_accelerations() * (step_size / 2)
+    simulation.positions += simulation.velocities * step_size
+    simulation.touch()
+    simulation.velocities += simulation.cached_accelerations() * (step_size / 2)
+
+
+def rk4(simulation, step_size: float) -> None:
+    x0 = simulation.positions
+    v0 = simulation.velocities
+
+    k1_x = v0
+    k1_v = simulation.accelerations(x0)
+    k2_x = v0 + k1_v * (step_size / 2)
+    k2_v = simulation.accelerations(x0 + k1_x * (step_size / 2))
+    k3_x = v0 + k2_v * (step_size / 2)
+    k3_v = simulation.accelerations(x0 + k2_x * (step_size / 2))
+    k4_x = v0 + k3_v * step_size
+    k4_v = simulation.accelerations(x0 + k3_x * step_size)
+
+    simulation.positions = x0 + (k1_x + 2 * k2_x + 2 * k3_x + k4_x) * (step_size / 6)
+    simulation.velocities = v0 + (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * (step_size / 6)
+    simulation.touch()
+
+
+def yoshida4(simulation, step_size: float) -> None:
+    """
+        Symplectic 4th order integrator, three leapfrog steps with tuned weights.
+    """
+    for drift, kick in zip(YOSHIDA_DRIFTS, YOSHIDA_KICKS):
+        simulation.positions += simulation.velocities * (drift * step_size)
+        simulation.touch()
+        simulation.velocities += simulation.accelerations() * (kick * step_size)
+    simulation.positions += simulation.velocities * (YOSHIDA_DRIFTS[-1] * step_size)
+    simulation.touch()
+
+
+def block_levels(simulation, accelerations: np.ndarray, step_size: float) -> np.ndarray:
+    """
+        Power of two level of every body, its own step is step_size / 2**level.
+        The wanted step is eta * |a| / |jerk|, a fraction of the time the acceleration needs to change.
+    """
+    acceleration = np.linalg.norm(accelerations, axis=1)
+    jerk = np.linalg.norm(simulation.jerks(), axis=1)
+    wanted = np.full(len(acceleration), np.inf)
+    np.divide(simulation.block_eta * acceleration, jerk, out=wanted, where=jerk > 0)
+    with np.errstate(divide="ignore"):
+        levels = np.ceil(np.log2(step_size / wanted))
+    return np.clip(levels, 0, simulation.block_max_level).astype(np.int64)
+
+
+def block_leapfrog(simulation, step_size: float) -> None:
+    """
+        Leapfrog with hierarchical block time steps. step_size is the longest step, every body
+        gets step_size / 2**level and only bodies finishing their step get new accelerations.
+        All bodies are synchronized again at the end of the block.
+    """
+    n = len(simulation)
+    if n == 0:
+        return
+    accelerations = simulation.cached_accelerations().copy()
+    levels = block_levels(simulation, accelerations, step_size)
+    top = int(levels.max())
+    substeps = 2**top
+    smallest_step = step_size / substeps
+    steps = (step_size / 2.0**levels)[:, np.newaxis]
+    period = 2**(top - levels)
+
+    for substep in range(substeps):
+        starting = substep % period == 0
+        simulation.velocities[starting] += accelerations[starting] * (steps[starting] / 2)
+        simulation.positions += simulation.velocities * smallest_step
+        simulation.touch()
+
+        active = np.flatnonzero((substep + 1) % period == 0)
+        accelerations[active] = simulation.accelerations_of(active)
+        simulation.velocities[active] += accelerations[active] * (steps[active] / 2)
+
+    # what a fixed step of smallest_step would have needed for all bodies
+    simulation.fixed_step_evaluations += n * substeps - int(np.sum(substeps // period))
+    # every body finished its step at the end of the block, so the accelerations are current
+    simulation._accelerations = accelerations
+
+
+INTEGRATORS = {
+    "euler": semi_implicit_euler,
+    "leapfrog": leapfrog,
+    "rk4": rk4,
+    "yoshida4": yoshida4,
+    "block": block_leapfrog,
+}
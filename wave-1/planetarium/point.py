@@ -1,7 +1,11 @@
 import math
+from array import array
+from typing import Iterable
 
 
 class Point:
+    __slots__ = ("x", "y")  # no __dict__, two pointers per instance
+
     def __init__(self, x: float, y: float) -> None:
         self.x = x
         self.y = y
@@ -21,14 +25,84 @@ class Point:
     def __mul__(self, b: float):
         return Point(self.x * b, self.y * b)
 
+    # in place variants, `a += b` changes a instead of allocating a new Point
+    def __iadd__(self, b: 'Point'):
+        self.x += b.x
+        self.y += b.y
+        return self
+
+    def __isub__(self, b: 'Point'):
+        self.x -= b.x
+        self.y -= b.y
+        return self
+
+    def __imul__(self, b: float):
+        self.x *= b
+        self.y *= b
+        return self
+
+    def add_scaled(self, b: 'Point', factor: float) -> 'Point':
+        """
+            self += b * factor without the temporary Point
+        """
+        self.x += b.x * factor
+        self.y += b.y * factor
+        return self
+
+    def distance_sq(self, b: 'Point') -> float:
+        dx = self.x - b.x
+        dy = self.y - b.y
+        return dx * dx + dy * dy
+
     def distance(self, b: 'Point') -> float:
-        distance_in_x_and_y_axis = self - b
-        return math.sqrt(distance_in_x_and_y_axis.x**2 + distance_in_x_and_y_axis.y**2)
+        return math.sqrt(self.distance_sq(b))
 
 
 Vector = Point  # this is alias. i.e. creates a class Vector, which is identical to class Point.
 
 
+class PointArray:
+    """
+        Many points in one flat array of doubles (x0, y0, x1, y1, ...),
+        the batch form for code that cannot use numpy.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, points: Iterable[Point] = ()) -> None:
+        self.data = array("d")
+        for p in points:
+            self.append(p)
+
+    def __len__(self) -> int:
+        return len(self.data) // 2
+
+    def __getitem__(self, i: int) -> Point:
+        return Point(self.data[2 * i], self.data[2 * i + 1])
+
+    def __setitem__(self, i: int, p: Point) -> None:
+        self.data[2 * i] = p.x
+        self.data[2 * i + 1] = p.y
+
+    def append(self, p: Point) -> None:
+        self.data.append(p.x)
+        self.data.append(p.y)
+
+    def add_scaled(self, b: 'PointArray', factor: float) -> 'PointArray':
+        """
+            self[i] += b[i] * factor for every point, in place
+        """
+        data, other = self.data, b.data
+        for i in range(len(data)):
+            data[i] += other[i] * factor
+        return self
+
+    def distance_sq(self, i: int, j: int) -> float:
+        data = self.data
+        dx = data[2 * i] - data[2 * j]
+        dy = data[2 * i + 1] - data[2 * j + 1]
+        return dx * dx + dy * dy
+
+
 def examples():
     a = Point(0, 1) + Vector(2, 3)  # Point(2, 4)
     print(a)  # (2, 4)
@@ -39,6 +113,10 @@ def examples():
     c = Point(0, 0).distance(Point(3, 4))  # float(5.0)
     print(c)  # 5.0
 
+    d = Point(1, 1)
+    d += Vector(1, 2)  # same object, now (2, 3)
+    print(d, d.distance_sq(Point(0, 0)))  # (2, 3) 13
+
 
 if __name__ == "__main__":
     examples()
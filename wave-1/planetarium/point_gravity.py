@@ -0,0 +1,49 @@
+"""
+Gravity steps on Points and PointArrays in pure python, without numpy.
+Neither allocates a Point per pair like the original Body.acceleration.
+Pairs at zero distance are skipped, like in forces.pairwise_accelerations.
+"""
+
+from array import array
+from typing import List
+
+from constants import GRAVITATION_CONSTANT
+from point import Point, PointArray, Vector
+
+
+def step_points(locations: List[Point], motion_vectors: List[Vector], masses: List[float], step_size: float) -> None:
+    """
+        Kicks every motion vector by the gravity of the other bodies and moves every location, in place.
+    """
+    for i, here in enumerate(locations):
+        vector = motion_vectors[i]
+        for j, there in enumerate(locations):
+            distance_sq = here.distance_sq(there)
+            if distance_sq > 0:  # also skips the body itself
+                factor = GRAVITATION_CONSTANT * masses[j] / (distance_sq * distance_sq**0.5) * step_size
+                vector.x += (there.x - here.x) * factor
+                vector.y += (there.y - here.y) * factor
+    for location, vector in zip(locations, motion_vectors):
+        location.add_scaled(vector, step_size)
+
+
+def step_point_arrays(locations: PointArray, motion_vectors: PointArray, masses: array, step_size: float) -> None:
+    """
+        Same as step_points on the flat arrays of PointArray.
+    """
+    positions, velocities = locations.data, motion_vectors.data
+    n = len(masses)
+    for i in range(n):
+        x, y = positions[2 * i], positions[2 * i + 1]
+        vx, vy = 0.0, 0.0
+        for j in range(n):
+            dx = positions[2 * j] - x
+            dy = positions[2 * j + 1] - y
+            distance_sq = dx * dx + dy * dy
+            if distance_sq > 0:  # also skips the body itself
+                factor = GRAVITATION_CONSTANT * masses[j] / (distance_sq * distance_sq**0.5)
+                vx += dx * factor
+                vy += dy * factor
+        velocities[2 * i] += vx * step_size
+        velocities[2 * i + 1] += vy * step_size
+    locations.add_scaled(motion_vectors, step_size)
@@ -0,0 +1,107 @@
+import random
+import tkinter
+from typing import List, Optional
+
+import numpy as np
+
+HEX_CHARS = "0123456789ABCDEF"
+TRAIL_LENGTH = 2000  # points kept per trail
+MARKER_RADIUS = 3  # pixels
+
+
+def rand_color():
+    s = "#"
+    for _ in range(6):
+        s += random.choice(HEX_CHARS)
+    return s
+
+
+class TrailRenderer:
+    """
+        Draws bodies straight on a Tk canvas. Every trail is a single polyline whose points live
+        in a fixed size ring buffer, so the number of canvas items and the work per frame
+        stay the same no matter how long the simulation runs. Trails belong to body ids,
+        so they stay with their bodies when others merge and the rows move.
+    """
+
+    def __init__(self, canvas: tkinter.Canvas, scale: float, trail_length: int = TRAIL_LENGTH):
+        self.canvas = canvas
+        self.scale = scale  # meters per pixel
+        self.trail_length = trail_length
+        self.center = (int(canvas['width']) / 2, int(canvas['height']) / 2)
+
+        self.trails = np.zeros((0, trail_length, 2))  # pixel coordinates
+        self.head = np.zeros(0, dtype=np.intp)  # where the next point of every trail goes
+        self.count = np.zeros(0, dtype=np.intp)  # how many points every trail has
+        self.lines: List[int] = []
+        self.markers: List[int] = []
+
+    def to_pixels(self, positions: np.ndarray) -> np.ndarray:
+        pixels = positions / self.scale
+        pixels[:, 0] = self.center[0] + pixels[:, 0]
+        pixels[:, 1] = self.center[1] - pixels[:, 1]
+        return pixels
+
+    def update(self, positions: np.ndarray, ids: Optional[np.ndarray] = None) -> None:
+        """
+            Adds the new positions (in meters) of the bodies with the given ids (row numbers by default)
+            to the trails and redraws everything that moved.
+        """
+        if ids is None:
+            ids = np.arange(len(positions))
+        self._grow(int(ids.max()) + 1 if len(ids) else 0)
+        pixels = np.full((len(self.lines), 2), np.nan)
+        pixels[ids] = self.to_pixels(positions)
+        visible = np.isfinite(pixels).all(axis=1)  # merged bodies and bodies removed from a replay are NaN
+
+        # points closer than one pixel to the previous one are not stored
+        bodies = np.arange(len(pixels))
+        last = self.trails[bodies, (self.head - 1) % self.trail_length]
+        moved = visible & ((self.count == 0) | (np.sum((pixels - last)**2, axis=1) >= 1))
+        changed = np.flatnonzero(moved)
+
+        self.trails[changed, self.head[changed]] = pixels[changed]
+        self.head[changed] = (self.head[changed] + 1) % self.trail_length
+        self.count[changed] = np.minimum(self.count[changed] + 1, self.trail_length)
+
+        # oldest to newest point of every changed trail, gathered in one go
+        order = (self.head[changed, np.newaxis] - self.count[changed, np.newaxis]
+                 + np.arange(self.trail_length)) % self.trail_length
+        ordered = self.trails[changed[:, np.newaxis], order]
+        for i, body in enumerate(changed):
+            points = ordered[i, :self.count[body]]
+            if len(points) < 2:
+                points = np.repeat(points, 2, axis=0)
+            self.canvas.coords(self.lines[body], points.ravel().tolist())
+
+            x, y = pixels[body]
+            self.canvas.coords(self.markers[body], x - MARKER_RADIUS, y - MARKER_RADIUS, x + MARKER_RADIUS, y + MARKER_RADIUS)
+
+        for body in np.flatnonzero(~visible):
+            self.canvas.itemconfigure(self.markers[body], state="hidden")
+
+    def clear_trails(self) -> None:
+        self.count[:] = 0
+        for line in self.lines:
+            self.canvas.coords(line, -1, -1, -1, -1)
+
+    def clear(self) -> None:
+        for item in self.lines + self.markers:
+            self.canvas.delete(item)
+        self.trails = np.zeros((0, self.trail_length, 2))
+        self.head = np.zeros(0, dtype=np.intp)
+        self.count = np.zeros(0, dtype=np.intp)
+        self.lines = []
+        self.markers = []
+
+    def _grow(self, n: int) -> None:
+        new = n - len(self.lines)
+        if new <= 0:
+            return
+        self.trails = np.concatenate((self.trails, np.zeros((new, self.trail_length, 2))))
+        self.head = np.concatenate((self.head, np.zeros(new, dtype=np.intp)))
+        self.count = np.concatenate((self.count, np.zeros(new, dtype=np.intp)))
+        for _ in range(new):
+            color = rand_color()
+            self.lines.append(self.canvas.create_line(-1, -1, -1, -1, fill=color))
+            self.markers.append(self.canvas.create_oval(-1, -1, -1, -1, fill=color, outline=color))
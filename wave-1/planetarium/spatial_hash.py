@@ -0,0 +1,90 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+# neighbouring cells checked for pairs, half of the 3x3 block so that every pair is found once
+_HALF_NEIGHBOURHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class SpatialHash:
+    """
+        Uniform grid over 2D points. Points are sorted by their cell, so the points of one cell
+        are a contiguous run found by binary search - building is a sort, queries touch only nearby cells.
+    """
+
+    def __init__(self, positions: np.ndarray, cell_size: float):
+        self.positions = positions
+        self.cell_size = cell_size
+        self.origin = positions.min(axis=0) if len(positions) else np.zeros(2)
+
+        # cells are shifted by one, so that the neighbours of border cells never wrap around to the other side
+        cells = np.floor((positions - self.origin) / cell_size).astype(np.int64) + 1
+        self.stride = int(cells[:, 1].max()) + 2 if len(positions) else 1
+        keys = cells[:, 0] * self.stride + cells[:, 1]
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+        self.cells = cells
+
+    def _cell_members(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        start = np.searchsorted(self.sorted_keys, keys, side="left")
+        end = np.searchsorted(self.sorted_keys, keys, side="right")
+        return start, end - start
+
+    def pairs_within(self, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            All pairs (i, j), i != j, of points closer than radius. radius must not exceed cell_size.
+        """
+        if radius > self.cell_size:
+            raise ValueError("radius has to be at most the cell size")
+        first, second = [], []
+        n = len(self.positions)
+        for dx, dy in _HALF_NEIGHBOURHOOD:
+            keys = (self.cells[:, 0] + dx) * self.stride + (self.cells[:, 1] + dy)
+            start, count = self._cell_members(keys)
+            i = np.repeat(np.arange(n), count)
+            offsets = np.arange(len(i)) - np.repeat(np.cumsum(count) - count, count)
+            j = self.order[np.repeat(start, count) + offsets]
+            if (dx, dy) == (0, 0):
+                # inside one cell every pair shows up twice and every point pairs with itself
+                keep = i < j
+                i, j = i[keep], j[keep]
+            first.append(i)
+            second.append(j)
+
+        i = np.concatenate(first)
+        j = np.concatenate(second)
+        diff = self.positions[i] - self.positions[j]
+        close = np.einsum('ij,ij->i', diff, diff) < radius**2
+        return i[close], j[close]
+
+    def query(self, point: np.ndarray, radius: float) -> np.ndarray:
+        """
+            Indices of points closer than radius to point.
+        """
+        if len(self.positions) == 0:
+            return np.zeros(0, dtype=np.intp)
+        low = np.floor((point - radius - self.origin) / self.cell_size).astype(np.int64) + 1
+        high = np.floor((point + radius - self.origin) / self.cell_size).astype(np.int64) + 1
+        low = np.maximum(low, 0)
+        high = np.minimum(high, (self.cells.max(axis=0) + 1))
+        found = []
+        for cell_x in range(low[0], high[0] + 1):
+            keys = cell_x * self.stride + np.arange(low[1], high[1] + 1)
+            start, count = self._cell_members(keys)
+            for s, c in zip(start, count):
+                found.append(self.order[s:s + c])
+        if not found:
+            return np.zeros(0, dtype=np.intp)
+        candidates = np.concatenate(found)
+        diff = self.positions[candidates] - point
+        return candidates[np.einsum('ij,ij->i', diff, diff) < radius**2]
+
+    def nearest(self, point: np.ndarray, radius: float) -> Optional[int]:
+        """
+            Index of the closest point within radius, None when there is none.
+        """
+        candidates = self.query(point, radius)
+        if len(candidates) == 0:
+            return None
+        distances = np.sum((self.positions[candidates] - point)**2, axis=1)
+        return int(candidates[np.argmin(distances)])
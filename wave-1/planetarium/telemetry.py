@@ -0,0 +1,80 @@
+import csv
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from engine import Simulation
+
+FIELDS = ("steps", "sim_time", "kinetic_energy", "potential_energy", "total_energy", "energy_drift",
+          "momentum_x", "momentum_y", "angular_momentum")
+SAMPLE = np.dtype([(field, np.float64) for field in FIELDS])
+
+
+class Telemetry:
+    """
+        Samples conserved quantities of a simulation every `interval` steps
+        and keeps the last `capacity` samples in a ring buffer.
+    """
+
+    def __init__(self, simulation: Simulation, interval: int = 100, capacity: int = 1000):
+        self.simulation = simulation
+        self.interval = interval
+        self.samples = np.zeros(capacity, dtype=SAMPLE)
+        self.count = 0  # samples taken in total, the newest one is at (count - 1) % capacity
+        self.initial_energy: Optional[float] = None
+        self._next_sample = 0
+
+    def rebase(self) -> None:
+        """
+            Starts measuring the drift again, for example after bodies were edited.
+        """
+        self.initial_energy = None
+
+    def reset(self) -> None:
+        self.count = 0
+        self._next_sample = 0
+        self.rebase()
+
+    def maybe_sample(self, steps: int, sim_time: float) -> None:
+        if steps >= self._next_sample:
+            self.sample(steps, sim_time)
+            self._next_sample = steps + self.interval
+
+    def sample(self, steps: int, sim_time: float) -> np.void:
+        sim = self.simulation
+        # barnes_hut runs use the tree for the potential energy too
+        theta = sim.theta if sim.solver == "barnes_hut" else None
+        kinetic = sim.kinetic_energy()
+        potential = sim.potential_energy(theta)
+        total = kinetic + potential
+        if self.initial_energy is None:
+            self.initial_energy = total
+        drift = (total - self.initial_energy) / abs(self.initial_energy) if self.initial_energy else 0.0
+        momentum = sim.momentum()
+
+        index = self.count % len(self.samples)
+        self.samples[index] = (steps, sim_time, kinetic, potential, total, drift,
+                               momentum[0], momentum[1], sim.angular_momentum())
+        self.count += 1
+        return self.samples[index]
+
+    def latest(self) -> Optional[np.void]:
+        if self.count == 0:
+            return None
+        return self.samples[(self.count - 1) % len(self.samples)].copy()
+
+    def history(self) -> np.ndarray:
+        """
+            Stored samples from the oldest to the newest.
+        """
+        if self.count <= len(self.samples):
+            return self.samples[:self.count].copy()
+        start = self.count % len(self.samples)
+        return np.concatenate((self.samples[start:], self.samples[:start]))
+
+    def to_csv(self, path: Path) -> None:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerows(self.history().tolist())
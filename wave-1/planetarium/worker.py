@@ -0,0 +1,190 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from checkpoint import restore_checkpoint
+from engine import Simulation
+from telemetry import Telemetry
+
+# how often the worker publishes a new snapshot, in seconds of wall-clock time
+PUBLISH_INTERVAL = 1 / 200
+
+
+@dataclass
+class Snapshot:
+    positions: np.ndarray
+    ids: np.ndarray  # stable body ids of the rows, they change when bodies merge
+    velocities: np.ndarray
+    masses: np.ndarray
+    names: List[str]
+    steps: int
+    sim_time: float
+    generation: int  # bumped by reset, snapshots of removed bodies can be recognized
+
+
+class SimulationWorker(threading.Thread):
+    """
+        Runs the simulation on its own thread. The renderer grants it simulated time to compute,
+        reads the latest published snapshot and sends every change of the simulation as a command,
+        so physics and drawing never wait for each other.
+    """
+
+    def __init__(self, simulation: Simulation, step_size: float, telemetry: Optional[Telemetry] = None):
+        super().__init__(daemon=True)
+        self.simulation = simulation
+        self.telemetry = telemetry
+        self.step_size = step_size
+        self.steps = 0
+        self.sim_time = 0.0
+        self.generation = 0
+        self.fast_forwarding = False
+        self._reported_merges = len(simulation.merges)
+
+        self._commands: queue.SimpleQueue = queue.SimpleQueue()
+        self._credit = 0.0  # simulated seconds the worker may still compute
+        self._credit_changed = threading.Condition()
+        self._stopped = False
+
+        # double buffer, the worker fills the back one and swaps them under the lock
+        self._swap_lock = threading.Lock()
+        self._front = self._snapshot()
+        self._back = self._snapshot()
+
+    def submit(self, command: Callable[[], None]) -> None:
+        """
+            Runs command on the worker thread between two steps.
+        """
+        self._commands.put(command)
+        with self._credit_changed:
+            self._credit_changed.notify()
+
+    def grant(self, sim_time: float) -> None:
+        """
+            Allows the worker to simulate sim_time more seconds. At most two grants are kept,
+            so that a slow simulation does not build up an endless backlog.
+        """
+        with self._credit_changed:
+            self._credit = min(self._credit + sim_time, 2 * sim_time)
+            self._credit_changed.notify()
+
+    def pause(self) -> None:
+        with self._credit_changed:
+            self._credit = 0.0
+
+    def stop(self) -> None:
+        with self._credit_changed:
+            self._stopped = True
+            self._credit_changed.notify()
+
+    def reset(self, generation: int) -> None:
+        """
+            Removes all bodies, has to be submitted as a command.
+        """
+        self.simulation.clear()
+        if self.telemetry is not None:
+            self.telemetry.reset()
+        self.steps = 0
+        self.sim_time = 0.0
+        self.generation = generation
+        self._publish()
+
+    def restore(self, data: Dict[str, np.ndarray], generation: int) -> None:
+        """
+            Replaces the simulation by a checkpoint read with read_checkpoint, has to be submitted as a command.
+        """
+        state = restore_checkpoint(self.simulation, data)
+        if self.telemetry is not None:
+            self.telemetry.reset()
+        self.steps = state['steps']
+        self.sim_time = state['sim_time']
+        self.step_size = state['step_size']
+        self.generation = generation
+        self._publish()
+
+    def fast_forward(self, target_time: float, generation: int) -> None:
+        """
+            Simulates until target_time at full speed without publishing anything in between,
+            has to be submitted as a command.
+        """
+        self.fast_forwarding = True
+        while self.sim_time < target_time and len(self.simulation):
+            step = min(self.step_size, target_time - self.sim_time)
+            self.simulation.step(step)
+            self.steps += 1
+            self.sim_time += step
+            if self.telemetry is not None:
+                self.telemetry.maybe_sample(self.steps, self.sim_time)
+        self.fast_forwarding = False
+        self.generation = generation
+        self._publish()
+
+    def latest(self) -> Snapshot:
+        with self._swap_lock:
+            front = self._front
+            return Snapshot(front.positions.copy(), front.ids.copy(), front.velocities.copy(), front.masses.copy(),
+                            list(front.names), front.steps, front.sim_time, front.generation)
+
+    def run(self) -> None:
+        last_publish = time.perf_counter()
+        while True:
+            if not self._commands.empty():
+                while not self._commands.empty():
+                    self._commands.get()()
+                self._publish()
+
+            with self._credit_changed:
+                while self._credit <= 0 and self._commands.empty() and not self._stopped:
+                    self._credit_changed.wait()
+                if self._stopped:
+                    return
+                step = min(self.step_size, self._credit)
+
+            if len(self.simulation) == 0:
+                self.pause()
+                continue
+            if step <= 0:
+                continue
+            self.simulation.step(step)
+            self.steps += 1
+            self.sim_time += step
+            with self._credit_changed:
+                self._credit -= step
+            if self.telemetry is not None:
+                self.telemetry.maybe_sample(self.steps, self.sim_time)
+
+            now = time.perf_counter()
+            if now - last_publish >= PUBLISH_INTERVAL or self._credit <= 0:
+                self._publish()
+                last_publish = now
+
+    def _snapshot(self) -> Snapshot:
+        sim = self.simulation
+        return Snapshot(sim.positions.copy(), sim.ids.copy(), sim.velocities.copy(), sim.masses.copy(),
+                        list(sim.names), self.steps, self.sim_time, self.generation)
+
+    def _report_merges(self) -> None:
+        merges = self.simulation.merges
+        for survivor, absorbed in merges[self._reported_merges:]:
+            print(f"{', '.join(absorbed)} merged into {survivor} at {self.sim_time:.0f} s")
+        self._reported_merges = len(merges)
+
+    def _publish(self) -> None:
+        if len(self.simulation.merges) != self._reported_merges:
+            self._report_merges()
+        back = self._back
+        if back.positions.shape != self.simulation.positions.shape:
+            back = self._snapshot()
+        else:
+            np.copyto(back.positions, self.simulation.positions)
+            np.copyto(back.ids, self.simulation.ids)
+            np.copyto(back.velocities, self.simulation.velocities)
+            np.copyto(back.masses, self.simulation.masses)
+            back.names[:] = self.simulation.names
+            back.steps, back.sim_time, back.generation = self.steps, self.sim_time, self.generation
+
+        with self._swap_lock:
+            self._back, self._front = self._front, back